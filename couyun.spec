@@ -24,6 +24,7 @@ a = Analysis(
         ('couyun/ci_pu/ci_origin', 'couyun/ci_pu/ci_origin'),
         ('couyun/ci_pu/ci_trad', 'couyun/ci_pu/ci_trad'),
         ('couyun/ci_pu/ci_index.json', 'couyun/ci_pu'),
+        ('couyun/hanzi/pinyin_lexicon.bin', 'couyun/hanzi'),
     ],
     hiddenimports=[],
     hookspath=[],
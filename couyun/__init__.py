@@ -1,4 +1,5 @@
 import os
+import sys
 
 PKG_ROOT = os.path.dirname(os.path.abspath(__file__))
 
@@ -19,6 +20,17 @@ ICO_PATH   = res_path(__file__, 'ui', 'assets', 'picture', 'ei.ico')
 FONT_PATH  = res_path(__file__, 'ui', 'assets', 'font', 'LXGWWenKaiMono-Regular.ttf')
 STATE_PATH = res_path(__file__, 'ui', 'assets', 'state', 'state.json')
 
+# 索引快照缓存目录，放在用户的缓存目录中而非包内（包可能装在只读位置）
+def user_cache_dir(app_name: str = 'couyun') -> str:
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), 'AppData', 'Local')
+        return os.path.join(base, app_name, 'Cache')
+    if sys.platform == 'darwin':
+        return os.path.join(os.path.expanduser('~'), 'Library', 'Caches', app_name)
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, app_name)
+CACHE_DIR  = user_cache_dir()
+
 # 背景图序列
 _BG_FILES = ['ei.jpg', 'ei_2.jpg', 'ei_3.jpg']
 def bg_pic(index: int) -> str:
@@ -26,6 +38,9 @@ def bg_pic(index: int) -> str:
                     _BG_FILES[index % len(_BG_FILES)])
 BG_DIR = res_path(__file__, 'ui', 'assets', 'picture')
 
+# 二进制拼音词典
+PINYIN_LEXICON = res_path(__file__, 'hanzi', 'pinyin_lexicon.bin')
+
 # 词谱
 CI_LIST        = res_path(__file__, 'ci_pu', 'ci_list')
 CI_LONG        = res_path(__file__, 'ci_pu', 'ci_long')
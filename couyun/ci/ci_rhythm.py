@@ -2,17 +2,21 @@
 
 from couyun.ci.ci_search import ci_type_extraction, search_ci, ci_idx
 from couyun.ci.cipai_word_counts import qin_num, long_num
-from couyun.common.common import hanzi_to_pingze, result_check, hanzi_to_yun
-import couyun.rhythm.new_rhythm as nw
-from collections import Counter
-from couyun.common.num_to_cn import num_to_cn
+from couyun.common.check_result import CheckResult, better_result
+from couyun.common.common import hanzi_to_pingze, hanzi_str_to_pingze, hanzi_to_yun
+from couyun.common.formatters import format_ci_text
+from couyun.common.verdict import CiReport, CiSegment, YunVerdict, MARK_DUO, MARK_PI, MARK_RIGHT, MARK_WRONG, \
+    YUN_BU, YUN_YA
+from couyun.rhythm.yun_mask import MaskCounter, first_in_mask, flip_tone, get_yun_masks, mask_to_yun_list, \
+    yun_list_to_masks, yun_to_bit
 
 
 class YunData:
-    def __init__(self, pos: int, hanzi: str, yun_num: list[int]):
+    def __init__(self, pos: int, hanzi: str, yun_num: list[int], masks: tuple[int, ...]):
         self.pos = pos
         self.hanzi = hanzi
         self.yun_num = yun_num
+        self.masks = masks  # 韵部的多层位掩码，协韵时取反
         self.xie_yun = False
         self.group = None
         self.is_yayun = False
@@ -20,9 +24,10 @@ class YunData:
 
 class YunDataProcessor:
     def __init__(self, yun_jiao_pos: list[int], yun_list: list[str], yun_jiao_class: dict,
-                 yun_num_list: list[list[int]]):
+                 yun_num_list: list[list[int]], yun_shu: int):
         self.yun_data = [
-            YunData(pos, hanzi, yun_num)
+            YunData(pos, hanzi, yun_num,
+                    get_yun_masks(hanzi, yun_shu, ci_lin=True) or yun_list_to_masks(yun_num, True, False))
             for pos, hanzi, yun_num in zip(yun_jiao_pos, yun_list, yun_num_list)
         ]
         self.yun_jiao_class = yun_jiao_class
@@ -40,6 +45,8 @@ class YunDataProcessor:
         for yun in self.yun_data:
             yun.xie_yun = self.xie_yun_map.get(yun.pos, False)
             yun.group = self.group_map.get(yun.pos, None)
+            if yun.xie_yun:
+                yun.masks = tuple(flip_tone(mask) for mask in yun.masks)
 
         group_min_pos = {}
         for yun in self.yun_data:
@@ -55,28 +62,28 @@ class YunDataProcessor:
                 yun.group = new_group_map[yun.group]
 
         for group_name in set(yun.group for yun in self.yun_data):
+            counter = MaskCounter()
             elements = []
             for yun in self.yun_data:
                 if yun.group == group_name:
                     yun_num = yun.yun_num
                     if yun.xie_yun:
                         yun_num = [-num for num in yun_num]
-                    elements.extend(yun_num)
-            if elements:
-                counter = Counter(elements)
-                most_common_element = counter.most_common(1)[0][0]
-                self.group_most_common[group_name] = most_common_element
+                    counter.add_masks(yun.masks)
+                    elements.append(yun_num)
+            best = counter.max_mask()
+            if best:
+                if not best & (best - 1):
+                    self.group_most_common[group_name] = mask_to_yun_list(best, True)[0]
+                else:
+                    self.group_most_common[group_name] = first_in_mask(elements, best, True)
             else:
                 self.group_most_common[group_name] = None
 
         for yun in self.yun_data:
             most_common = self.group_most_common.get(yun.group)
-            if most_common is not None:
-                yun_num = yun.yun_num
-                if yun.xie_yun:
-                    yun_num = [-num for num in yun_num]
-                if most_common in yun_num:
-                    yun.is_yayun = True
+            if most_common is not None and yun.masks:
+                yun.is_yayun = bool(yun.masks[0] & yun_to_bit(most_common, True))
 
         result = []
         for yun in self.yun_data:
@@ -93,103 +100,43 @@ class YunDataProcessor:
 
 
 def _yun_data_process(yun_jiao_pos: list[int], yun_list: list[str], yun_jiao_class: dict,
-                      yun_num_list: list[list[int]]):
-    processor = YunDataProcessor(yun_jiao_pos, yun_list, yun_jiao_class, yun_num_list)
+                      yun_num_list: list[list[int]], yun_shu: int):
+    processor = YunDataProcessor(yun_jiao_pos, yun_list, yun_jiao_class, yun_num_list, yun_shu)
     return processor.process()
 
 
 class CiRhythm:
     def __init__(self, yun_shu: int, ci_pai_name: str, ci_content: str, ci_comma_pos: str,
-                 give_type: str, ci_pu: int, is_trad: bool):
+                 give_type: str, ci_pu: int, is_trad: bool, content_pingze: str = None):
         self.yun_shu = yun_shu
         self.ci_pai_name = ci_pai_name
         self.ci_content = ci_content
         self.ci_comma_pos = ci_comma_pos
         self.give_type = give_type
         self.ci_pu = ci_pu
-        self.show_mark = ['◎', '●', '〇', '�']
         self.is_trad = is_trad
+        # 词内容的平仄代码串，各格式共用；可由调用者预先给出
+        self.content_pingze = content_pingze or hanzi_str_to_pingze(ci_content, int(yun_shu), is_trad)
 
-    def _ci_yun_list_to_hanzi_yun(self, yun_list: list[int]):
-        """
-        将数字表示的韵部转换为汉字表示的韵部
-        Args:
-            yun_list: 单个字的韵数字代码列表
-        Returns:
-            汉字表示的韵部
-        """
-        yun_shu = int(self.yun_shu)
-        if yun_shu == 1:
-            hanzi_yun_list = []
-            for i in yun_list:
-                if i < 0:
-                    i = -i
-                    ping_ze = '仄'
-                else:
-                    if i > 14:
-                        ping_ze = '入聲' if self.is_trad else '入声'
-                    else:
-                        ping_ze = '平'
-                hanzi_yun_list.append(num_to_cn(i) + '部' + ping_ze)
-            return '、'.join(hanzi_yun_list)
-        elif yun_shu == 2:
-            using_xin = nw.xin_hanzi_trad if self.is_trad else nw.xin_hanzi
-            return nw.show_yun(yun_list, nw.xin_yun, using_xin)
-        using_tong = nw.tong_hanzi_trad if self.is_trad else nw.tong_hanzi
-        return nw.show_yun(yun_list, nw.tong_yun, using_tong)
-
-    @staticmethod
-    def _yun_right_list(ci_seperate_lis: list[str], ci_content_right: list[bool | str]):
-        """
-        根据分割好的词列表以及布尔平仄正误列表得到分割好的字符串平仄正误列表
-        Args:
-            ci_seperate_lis: 分割好的词列表
-            ci_content_right: 布尔平仄正误列表
-        Returns:
-            分割好的字符串平仄正误列表
-        """
-        conversion = {True: '〇', 'duo': '◎', False: '●', 'pi': '✕'}
-        result_list = []
-        ptr = 0
-
-        for poem in ci_seperate_lis:
-            non_space_chars = poem.replace('\u3000', '')
-            non_space_count = len(non_space_chars)
-            sub_right = ci_content_right[ptr:ptr + non_space_count]
-            converted = []
-            j = 0
-            for char in poem:
-                if char == '\u3000':
-                    converted.append('\u3000')
-                else:
-                    converted_char = conversion.get(sub_right[j], sub_right[j])
-                    converted.append(converted_char)
-                    j += 1
-            ptr += non_space_count
-            result_list.append(''.join(converted))
-        return result_list
-
-    def _ping_ze_right(self, cipai: str) -> list[str | bool]:
+    def _ping_ze_right(self, cipai: str) -> str:
         """
         检验一首词是否符合一个词牌特定格式的平仄。
         Args:
             cipai: 删去标识词句读韵等的词的格律
         Returns:
-            平仄正误的列表 True对 False错 "duo"多音字无法判断
+            逐字判定代码串，见 couyun.common.verdict，多音字无法判断，一律为多音
         """
-        yun_shu = int(self.yun_shu)
         result = []
-        for hanzi_num in range(len(self.ci_content)):
-            ping_ze = hanzi_to_pingze(self.ci_content[hanzi_num], yun_shu, self.is_trad)
+        for hanzi_num, ping_ze in enumerate(self.content_pingze):
             if ping_ze == '0':
-                result.append('duo')
+                result.append(MARK_DUO)
             elif ping_ze == '3':
-                result.append('pi')
+                result.append(MARK_PI)
             elif ping_ze == '1':
-                result.append(True) if cipai[hanzi_num] in '平中' else result.append(False)
+                result.append(MARK_RIGHT if cipai[hanzi_num] in '平中' else MARK_WRONG)
             else:
-                result.append(True) if cipai[hanzi_num] in "仄中" else result.append(False)
-        return result
+                result.append(MARK_RIGHT if cipai[hanzi_num] in "仄中" else MARK_WRONG)
+        return ''.join(result)
 
     def _replace_user_ci_text(self, ci_cut_list: list[str]) -> list[str]:
         """
@@ -217,37 +164,6 @@ class CiRhythm:
             current_pos += length
         return user_cut_text
 
-    def _show_ci(self, ge_lyu_final: list, text_final: list, yun_final: list, your_lyu_final: list) -> str:
-        """
-        将所有得到的结果组合称为最终的结果
-        Args:
-            ge_lyu_final: 词的格律
-            text_final: 输入的词的内容
-            yun_final: 押韵结果
-            your_lyu_final: 平仄符合与否的结果
-        Returns:
-            组合的结果
-        """
-        result = ''
-        _map = str.maketrans("换叠读举儿韵", "換疊讀舉兒韻")
-        for _ in range(len(ge_lyu_final)):
-            original_single_ge_lyu = ge_lyu_final[_]
-            if self.is_trad:
-                original_single_ge_lyu = original_single_ge_lyu.translate(_map)
-            result += original_single_ge_lyu + '\n'
-            result += text_final[_] + '\u3000'
-            result += yun_final[_] + '\n'
-            if "不押韵" in yun_final[_] or '不押韻' in yun_final[_]:
-                result += your_lyu_final[_][:-1] + '■' + '\n\n'
-            if "不" not in yun_final[_]:
-                if your_lyu_final[_][-1] == '●':
-                    result += your_lyu_final[_][:-1] + '■' + '\n\n'
-                else:
-                    result += your_lyu_final[_][:-1] + '□' + '\n\n'
-            if "不知韵部" in yun_final[_] or '不知韻部' in yun_final[_]:
-                result += your_lyu_final[_] + '\n\n'
-        return result.rstrip() + '\n'
-
     @staticmethod
     def _find_punctuation_positions(text: str) -> list[int]:
         comma_syms = {',', '.', '?', '!', ':', "，", "。", "？", "！", "、", "：", '\u3000'}
@@ -305,33 +221,31 @@ class CiRhythm:
         cand = [n for n in check_num[length] if self._cipai_confirm(ci_type_extraction(n, self.ci_pu))]
         return cand or 3
 
-    def _build_single_ci_report(self, ci_num: str) -> str | int:
+    def _build_single_ci_report(self, ci_num: str, type_list: list, ok_types: list[int]) -> CheckResult | int:
         """为单个词牌生成最优格式报告。"""
-        type_list = ci_type_extraction(ci_num, self.ci_pu)
-        ok_types = self._cipai_confirm(type_list)
         if not ok_types:
             return 1
         use_types, warn = self._filter_given_type(ok_types)
         if warn == 'error':
             return 2
-        best = ''
+        best = None
         for fmt_id in use_types:
             report = self._one_format_report(ci_num, type_list, fmt_id)
-            best = result_check(best, report)
+            best = better_result(best, report)
 
         # 2. 拼装词牌名 + 降级提示（若有）
+        best.report.name = ci_idx[int(ci_num)]['names_trad' if self.is_trad else 'names'][0]
+        best.report.warn = bool(warn)
+        prefix = ''
         if not self.ci_pai_name:
-            if self.is_trad:
-                best = ci_idx[int(ci_num)]['names_trad'][0] + '\n' + best
-            else:
-                best = ci_idx[int(ci_num)]['names'][0] + '\n' + best
+            prefix = best.report.name + '\n'
         if warn:
             if self.is_trad:
                 warn_word = "給定格式與實際相差過大或沒有此格式，將另行匹配。\n"
             else:
                 warn_word = "给定格式与实际相差过大或没有此格式，将另行匹配。\n"
-            best = warn_word + best
-        return best
+            prefix = warn_word + prefix
+        return best.with_prefix(prefix) if prefix else best
 
     def _filter_given_type(self, ok_types: list[int]) -> tuple[list[int], bool | str]:
         """
@@ -358,8 +272,8 @@ class CiRhythm:
             return [idx] if idx in ok_types else -1
         return -1
 
-    def _one_format_report(self, ci_num: str, type_list: list, fmt_id: int) -> str:
-        """生成「格 x」的完整校验文本。"""
+    def _one_format_report(self, ci_num: str, type_list: list, fmt_id: int) -> CheckResult:
+        """生成「格 x」的逐片段判定，得分由判定计算，文本只在读取时生成。"""
         fmt = type_list[fmt_id]
         remain = fmt['ge_lyu_str']
         yun_pos = fmt['rhyme_pos']
@@ -371,31 +285,33 @@ class CiRhythm:
         yun_nums = [hanzi_to_yun(self.ci_content[i], self.yun_shu, self.is_trad, ci_lin=True)
                     for i in yun_pos]
         yun_show = _yun_data_process(yun_pos, [self.ci_content[i] for i in yun_pos],
-                                     yun_class, yun_nums)
-        yun_info = [self._fmt_yun_info(s) for s in yun_show]
-
-        pingze_right = self._ping_ze_right(remain)
-        yun_final = self._yun_right_list(real_lis, pingze_right)
-
-        report = f'你的格式为 格{num_to_cn(fmt_id + 1)}\n\n'
-        report += self._show_ci(cut_lis, my_text, yun_info, yun_final)
+                                     yun_class, yun_nums, self.yun_shu)
+        yun_verdicts = [self._yun_verdict(d) for d in yun_show]
 
+        marks = self._ping_ze_right(remain)
+        segments = []
+        ptr = 0
+        for i, part in enumerate(real_lis):
+            length = len(part) - part.count('\u3000')
+            segments.append(CiSegment(cut_lis[i], my_text[i], marks[ptr:ptr + length], yun_verdicts[i]))
+            ptr += length
         # 水龙吟格二十四特殊处理
+        last_mark = None
         if fmt_id == 23 and int(ci_num) == 658:
-            report += (f'\n仄句\n{self.ci_content[-1]}\n'
-                       f'{self.show_mark[int(hanzi_to_pingze(self.ci_content[-1], self.yun_shu, self.is_trad))]}\n')
-        return report
-
-    def _fmt_yun_info(self, d: dict) -> str:
-        """把单个韵脚字典变成人类可读串。"""
-        hanzi_yun = self._ci_yun_list_to_hanzi_yun(d['yun_num'])
-        # group = f"第{d['group']}组韵"  如果这里报错就看看韵表
-        group = f'第{num_to_cn(d["group"])}組韻' if self.is_trad else f"第{num_to_cn(d['group'])}组韵"
-        yayun = '' if d['is_yayun'] else '不'
-        info = f'{hanzi_yun} {group} {yayun}押韻' if self.is_trad else f'{hanzi_yun} {group} {yayun}押韵'
-        if '零' in info or len(info) == 9:
-            return '不知韻部' if self.is_trad else '不知韵部'
-        return info
+            last_mark = hanzi_to_pingze(self.ci_content[-1], self.yun_shu, self.is_trad)
+
+        report = CiReport(self.ci_content, self.yun_shu, self.is_trad, ci_num, fmt_id,
+                          segments, yun_verdicts, last_mark)
+        return CheckResult.from_report(report, lambda: format_ci_text(report))
+
+    def _yun_verdict(self, d: dict) -> YunVerdict:
+        """
+        把单个韵脚字典变成韵脚判定。韵书中查不到韵部的字为不知韵部。
+        """
+        yun_num = d['yun_num']
+        unknown = not yun_num or (int(self.yun_shu) != 1 and yun_num == [107])
+        return YunVerdict(d['hanzi'], yun_num, YUN_YA if d['is_yayun'] else YUN_BU, unknown,
+                          d['group'], d['xie_yun'])
 
     def main_ci(self) -> str | int:
         """
@@ -403,14 +319,46 @@ class CiRhythm:
         Returns:
             校验文本 | 错误码 0/1/2/3
         """
-        # 1. 确定要试的词牌编号列表
+        result = self.check()
+        return result if isinstance(result, int) else result.text
+
+    def candidates(self) -> list[tuple[str, list, list[int]]] | int:
+        """
+        要试的词牌及其中与输入句读相符的格式。只取决于词牌名、词内容与句读，与韵书无关，可供不同韵书的校验共用。
+        Returns:
+            (词牌编号, 词牌的全部格式, 相符的格式序号列表) 的列表 | 错误码 0/3/4
+        """
         ci_nums = self._collect_candidate_ci_nums()
-        if isinstance(ci_nums, int):  # 0 或 3
+        if isinstance(ci_nums, int):
             return ci_nums
+        candidates = []
+        for ci_num in ci_nums:
+            type_list = ci_type_extraction(ci_num, self.ci_pu)
+            candidates.append((ci_num, type_list, self._cipai_confirm(type_list)))
+        return candidates
+
+    def check(self, candidates: list[tuple[str, list, list[int]]] | int = None) -> CheckResult | int:
+        """
+        校验词牌，只得到判定，文本等输出由 couyun.common.formatters 按需生成
+        Args:
+            candidates: 预先得到的 candidates() 的结果，不给则现场计算
+        Returns:
+            最匹配的校验结果 | 错误码 0/1/2/3
+        """
+        # 1. 确定要试的词牌编号列表
+        if candidates is None:
+            candidates = self.candidates()
+        if isinstance(candidates, int):  # 0 或 3
+            return candidates
 
         # 2. 对每个词牌、每个合格格式生成报告，再 pairwise 选最优
-        best = ''
-        for ci_num in ci_nums:
-            report = self._build_single_ci_report(ci_num)
-            best = result_check(best, report)
+        best = None
+        for ci_num, type_list, ok_types in candidates:
+            report = self._build_single_ci_report(ci_num, type_list, ok_types)
+            if isinstance(report, int):  # 错误码只在没有任何结果时返回
+                best = report if best is None else best
+            elif best is None or isinstance(best, int):
+                best = report
+            else:
+                best = better_result(best, report)
         return best
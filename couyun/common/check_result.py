@@ -0,0 +1,111 @@
+"""
+校验结果模块。一首诗、词可能对应多个候选格式，每个候选的得分由判定直接计算，
+比较候选时只比较得分，只有最终选中的候选才生成文本。
+"""
+
+class ScoreCounter:
+    """
+    由判定逐行累计一个候选结果的得分：
+        正确平仄数：每行中平仄正确（〇）与多音字（◎）的字各计一分，押韵的韵脚（□）计一分，不押韵的韵脚（■）扣一分；
+            没有韵脚且没有平仄正确的字的行不计分
+        押韵数：韵脚的个数，押韵与否都计
+        韵种类：韵脚所属的最大组号，只计一至十组
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.yayun_count = 0
+        self.yun_types = 1
+
+    def add_marks(self, marks: str, tail: str = None) -> None:
+        """
+        累计一行平仄标记的得分，标记不必先转换为文本。
+        Args:
+            marks: 逐字判定代码串，见 couyun.common.verdict
+            tail: 替换末字标记的押韵标记 □ 或 ■，没有时为 None
+        """
+        if tail:
+            marks = marks[:-1]
+        right = marks.count('0')
+        if tail or right:
+            self.count += right + marks.count('2') + (tail == '□')
+
+    def add_yun(self, is_yayun: bool) -> None:
+        """累计一个韵脚的得分，不押韵时扣一分"""
+        if not is_yayun:
+            self.count -= 1
+        self.yayun_count += 1
+
+    def add_group(self, group: int) -> None:
+        """
+        记录韵脚所属的组，韵种类取其中最大的组号，只计一至十组。
+        Args:
+            group: 韵脚的组号
+        """
+        if group <= 10:
+            self.yun_types = max(self.yun_types, group)
+
+
+class CheckResult:
+    """
+    一个候选的校验结果：总正确平仄数、押韵数、韵种类，判定，以及生成文本的函数。文本在第一次读取时才生成。
+    """
+
+    def __init__(self, count: int, yayun_count: int, yun_types: int, render, report=None):
+        """
+        Args:
+            count: 总正确平仄数
+            yayun_count: 押韵数
+            yun_types: 韵种类
+            render: 无参数的函数，返回结果文本
+            report: 校验的判定，见 couyun.common.verdict
+        """
+        self.count = count
+        self.yayun_count = yayun_count
+        self.yun_types = yun_types
+        self.report = report
+        self._render = render
+        self._text = None
+
+    @classmethod
+    def from_score(cls, score: ScoreCounter, render, report=None) -> 'CheckResult':
+        return cls(score.count, score.yayun_count, score.yun_types, render, report)
+
+    @classmethod
+    def from_report(cls, report, render) -> 'CheckResult':
+        """
+        由判定得到校验结果，得分直接由判定计算，不生成文本。
+        Args:
+            report: ShiReport 或 CiReport
+            render: 无参数的函数，由判定生成结果文本
+        """
+        return cls.from_score(report.score(), render, report)
+
+    @property
+    def key(self) -> tuple[int, int, int]:
+        """比较用的键：正确平仄数越多、押韵数越多、韵种类越少越好"""
+        return self.count, self.yayun_count, -self.yun_types
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self._render()
+        return self._text
+
+    def with_prefix(self, prefix: str) -> 'CheckResult':
+        """在文本前加上提示，得分不变"""
+        return CheckResult(self.count, self.yayun_count, self.yun_types, lambda: prefix + self.text, self.report)
+
+
+def better_result(post_result: CheckResult | None, temp_result: CheckResult) -> CheckResult:
+    """
+    两个候选结果中更匹配的一个：先比正确平仄数，多者为优；再比押韵数，多者为优；再比韵种类，少者为优；都相同时取后者。
+    Args:
+        post_result: 上一个校验的结果，没有时为 None
+        temp_result: 目前校验的结果
+    Returns:
+        两者中更匹配的结果
+    """
+    if post_result is None or temp_result.key >= post_result.key:
+        return temp_result
+    return post_result
@@ -1,22 +1,54 @@
 """一些都会用到的通用模块。"""
 
-import re
-
 import couyun.rhythm.new_rhythm as nw
-from couyun.rhythm.pingshui_rhythm import hanzi_rhythm
+from couyun.common.num_to_cn import num_to_cn
+from couyun.common.snapshot import load_snapshot
+from couyun.rhythm.pingshui_rhythm import get_hanzi_index, hanzi_rhythm, rhythm_name, rhythm_name_trad
+from couyun.rhythm.pingze_table import table_pingze, get_pingze_translation
+from couyun.rhythm.yun_index import get_yun_index, yun_book_name
 
-cn_nums = {'一': 1, '二': 2, '两': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9, '十': 10}
+_rhythm_display = {False: {}, True: {}}  # 简、繁两种模式下已生成的查字结果
 
 
 def show_all_rhythm(single_hanzi: str, is_trad: bool) -> str | None:
     """
-    给定一个汉字，返回其平水、词林、新韵、通韵韵部。
+    给定一个汉字，返回其平水、词林、新韵、通韵韵部。每个字在简繁两种模式下的结果只生成一次，之后直接查表。
     Args:
         single_hanzi: 单个汉字
         is_trad: 簡體 or 繁體
     Returns:
         平水、词林、新韵、通韵韵部，如果输入的汉字过于生僻不能识别，返回 None（不是我这有接近20000个汉字，正常写诗那用得到什么奇葩生僻字啊）
     """
+    table = _rhythm_display[bool(is_trad)]
+    result = table.get(single_hanzi)
+    if result is None:
+        result = table[single_hanzi] = _render_all_rhythm(single_hanzi, is_trad)
+    return result
+
+
+def export_all_rhythm(is_trad: bool) -> dict[str, str]:
+    """
+    导出所有收录汉字的查字结果，供字典等需要整表的场合使用。整表建立一次后存为快照。
+    Args:
+        is_trad: 簡體 or 繁體
+    Returns:
+        汉字到 show_all_rhythm 结果的字典，按码位排列
+    """
+    mode = 'trad' if is_trad else 'simp'
+    table = load_snapshot(f'rhythm_display_{mode}', lambda: _build_all_rhythm(is_trad))
+    _rhythm_display[bool(is_trad)].update(table)
+    return table
+
+
+def _build_all_rhythm(is_trad: bool) -> dict[str, str]:
+    chars = set(get_hanzi_index())
+    chars.update(hanzi for hanzi, _ in nw.get_pinyin_lexicon().items())
+    chars.discard('\n')
+    return {hanzi: _render_all_rhythm(hanzi, is_trad) for hanzi in sorted(chars)}
+
+
+def _render_all_rhythm(single_hanzi: str, is_trad: bool) -> str:
+    """生成一个汉字的查字结果"""
     result = ''
     yun = '韻' if is_trad else '韵'
     hua = '華' if is_trad else '华'
@@ -36,6 +68,143 @@ def show_all_rhythm(single_hanzi: str, is_trad: bool) -> str | None:
     return result
 
 
+def yun_to_hanzi(yun_num: int, yun_shu: int, ci_lin: bool = False, tone: int = 0, common: int = 0) -> str:
+    """
+    给定韵部，返回该韵部的全部汉字。
+    Args:
+        yun_num: 韵部编号，平水韵为 1-106 的总编号，词林正韵为 1-19，新韵、通韵为各自的韵部编号
+        yun_shu: 使用韵书的代码
+        ci_lin: 是否查询词林正韵
+        tone: 声调，0 不限；平水、词林为 1平 2上 3去 4入；新韵、通韵为 1平 2仄
+        common: 常用字范围，0 不限 1 简体常用字 2 繁体常用字
+    Returns:
+        按码位排列的汉字串，没有则返回空字符串
+    """
+    return get_yun_index(yun_book_name(yun_shu, ci_lin)).get((yun_num, tone, common), '')
+
+
+# 平水韵各声调部分的称呼，平声分上平、下平两部分各十五韵，“平”可指其中任一部分
+PINGSHUI_TONE_PREFIXES = (('上平', '平'), ('下平', '平'), ('上声', '上聲', '上'), ('去声', '去聲', '去'),
+                          ('入声', '入聲', '入'))
+
+
+def _yun_name_sections(yun_shu: int) -> list[tuple[tuple[str, ...], str, str, int]]:
+    """
+    韵书按声调分成的各部分，新韵、通韵只有一部分。
+    Args:
+        yun_shu: 使用韵书的代码，1 为平水韵
+    Returns:
+        每部分一项：该部分的称呼，简体部名串，繁體部名串，该部分之前的韵部数
+    """
+    if yun_shu == 1:
+        ping, *others = (names.rstrip('？') for names in rhythm_name)
+        ping_trad, *others_trad = (names.rstrip('？') for names in rhythm_name_trad)
+        names = [ping[:15], ping[15:], *others]
+        trad_names = [ping_trad[:15], ping_trad[15:], *others_trad]
+    else:
+        names = [''.join(nw.xin_hanzi) if yun_shu == 2 else ''.join(nw.tong_hanzi)]
+        trad_names = [''.join(nw.xin_hanzi_trad) if yun_shu == 2 else ''.join(nw.tong_hanzi_trad)]
+    sections = []
+    offset = 0
+    for idx, (name_str, trad_str) in enumerate(zip(names, trad_names)):
+        prefixes = PINGSHUI_TONE_PREFIXES[idx] if yun_shu == 1 else ()
+        sections.append((prefixes, name_str, trad_str, offset))
+        offset += len(name_str)
+    return sections
+
+
+def _parse_yun_input(yun_input: str, yun_shu: int, ci_lin: bool) -> int | None:
+    """
+    将用户输入的韵部转换为韵部编号，无法识别返回 None。
+    输入可以是阿拉伯数字、汉字数字，或部名；部名前可以加序号（如“一东”），平水韵还可以加声调（如“上平一东”“入屋”），
+    序号、声调须与部名相符。
+    """
+    yun_input = yun_input.strip().rstrip('部韵韻')
+    if not yun_input:
+        return None
+    sections = [] if yun_shu == 1 and ci_lin else _yun_name_sections(yun_shu)
+    total = 19 if yun_shu == 1 and ci_lin else sum(len(names) for _, names, _, _ in sections)
+    cn_to_num = {num_to_cn(i): i for i in range(1, total + 1)}
+
+    def to_num(numeral: str) -> int | None:
+        if numeral.isdecimal():
+            return int(numeral)
+        return cn_to_num.get(numeral)
+
+    yun_num = to_num(yun_input)
+    if yun_num is not None:
+        return yun_num if 1 <= yun_num <= total else None
+    for prefixes, names, trad_names, offset in sections:
+        rest = yun_input
+        prefix = next((prefix for prefix in prefixes if rest.startswith(prefix)), '')
+        rest = rest[len(prefix):]
+        for name_str in (names, trad_names):
+            pos = name_str.find(rest[-1:]) if rest else -1
+            if pos == -1:
+                continue
+            numeral = rest[:-1]
+            if not numeral or to_num(numeral) == pos + 1:
+                return offset + pos + 1
+    return None
+
+
+def _pingshui_section(yun_num: int) -> tuple[int, int]:
+    """平水韵总编号转换为 (声调序号 0平 1上 2去 3入, 在该声调中的序号)，平声下平部分从一重新计数"""
+    for tone_idx, names in enumerate(rhythm_name):
+        if yun_num <= len(names.rstrip('？')):
+            return tone_idx, yun_num - 15 if tone_idx == 0 and yun_num > 15 else yun_num
+        yun_num -= len(names)
+    return 3, yun_num
+
+
+def show_yun_hanzi(yun_input: str, yun_shu: int, is_trad: bool, ci_lin: bool = False,
+                   common_only: bool = False) -> str | None:
+    """
+    给定一个韵部，展示该韵部的全部汉字，按声调分行。
+    Args:
+        yun_input: 韵部，可以是编号或部名，如“1”“一”“东”“一东”“上平一东”
+        yun_shu: 使用韵书的代码
+        is_trad: 簡體 or 繁體
+        ci_lin: 是否查询词林正韵
+        common_only: 是否只展示常用字
+    Returns:
+        展示结果，如果无法识别输入的韵部，返回 None
+    """
+    yun_num = _parse_yun_input(yun_input, yun_shu, ci_lin)
+    if yun_num is None:
+        return None
+    common = (2 if is_trad else 1) if common_only else 0
+    yun = '韻' if is_trad else '韵'
+    hua = '華' if is_trad else '华'
+    if yun_shu == 1 and not ci_lin:
+        tone_idx, section_num = _pingshui_section(yun_num)
+        using_name = rhythm_name_trad if is_trad else rhythm_name
+        title = f'平水{yun}{num_to_cn(section_num)}{"".join(using_name)[yun_num - 1]}'
+        tones = [(tone_idx + 1, '')]
+    elif yun_shu == 1:
+        title = f'詞林正韻第{num_to_cn(yun_num)}部' if is_trad else f'词林正韵第{num_to_cn(yun_num)}部'
+        tones = [(1, '平聲'), (2, '上聲'), (3, '去聲'), (4, '入聲')] if is_trad else \
+            [(1, '平声'), (2, '上声'), (3, '去声'), (4, '入声')]
+    else:
+        if yun_shu == 2:
+            using_name = nw.xin_hanzi_trad if is_trad else nw.xin_hanzi
+            book_name = f'中{hua}新{yun}'
+        else:
+            using_name = nw.tong_hanzi_trad if is_trad else nw.tong_hanzi
+            book_name = f'中{hua}通{yun}'
+        title = f'{book_name}{num_to_cn(yun_num)}{using_name[yun_num - 1]}'
+        tones = [(1, '平'), (2, '仄')]
+    result = title + '：\n'
+    for tone, tone_name in tones:
+        hanzis = yun_to_hanzi(yun_num, yun_shu, ci_lin, tone, common)
+        if not hanzis:
+            continue
+        result += (f'{tone_name}：' if tone_name else '') + hanzis + '\n'
+    if result == title + '：\n':
+        result += '未能在韻書中查詢到該韻部的漢字\n' if is_trad else '未能在韵书中查询到该韵部的汉字\n'
+    return result
+
+
 def hanzi_to_yun(hanzi: str, yun_shu: int, is_trad: bool, ci_lin: bool = False) -> list[int]:
     """
     将一个汉字对应为韵书中韵部的列表。
@@ -52,8 +221,8 @@ def hanzi_to_yun(hanzi: str, yun_shu: int, is_trad: bool, ci_lin: bool = False)
             return hanzi_rhythm(hanzi, is_trad, ci_lin=True)
         return hanzi_rhythm(hanzi, is_trad)
     elif yun_shu == 2:
-        return nw.convert_yun(nw.get_new_yun(hanzi), nw.xin_yun)
-    return nw.convert_yun(nw.get_new_yun(hanzi), nw.tong_yun)
+        return nw.hanzi_new_yun(hanzi, nw.xin_yun)
+    return nw.hanzi_new_yun(hanzi, nw.tong_yun)
 
 
 def hanzi_to_pingze(hanzi: str, yun_shu: int, is_trad: bool) -> str:
@@ -66,61 +235,23 @@ def hanzi_to_pingze(hanzi: str, yun_shu: int, is_trad: bool) -> str:
     Returns:
         平仄代码
     """
+    if len(hanzi) == 1:
+        ping_ze = table_pingze(hanzi, yun_shu)
+        if ping_ze is not None:
+            return ping_ze
     if yun_shu == 1:
         return hanzi_rhythm(hanzi, is_trad, only_ping_ze=True)
     return nw.new_ping_ze(nw.get_new_yun(hanzi))
 
 
-def result_check(post_result: str, temp_result: str) -> str:
+def hanzi_str_to_pingze(hanzi_str: str, yun_shu: int, is_trad: bool) -> str:
     """
-    如果一首诗、词可能对应多个结构，需要排查整体的结果，根据平仄和押韵符合字数的多少，是否押更多的韵数，是否有更少的韵种类，确定一个最接近的。
-    Args:
-        post_result: 上一个校验的结果
-        temp_result: 目前校验的结果
-    Returns:
-        两者中更匹配的结果
-    """
-    if post_result == '':
-        return temp_result
-    post_count, post_yayun_count, post_yayun_type = count_poem_para(post_result)
-    temp_count, temp_yayun_count, temp_yayun_type = count_poem_para(temp_result)
-    if temp_count > post_count:
-        return temp_result
-    if temp_count == post_count:
-        if post_yayun_count > temp_yayun_count:
-            return post_result
-        if post_yayun_count == temp_yayun_count:
-            if temp_yayun_type > post_yayun_type:
-                return post_result
-            return temp_result
-        return temp_result
-    return post_result
-
-
-def count_poem_para(string: str) -> tuple[int, int, int]:
-    """
-    对一个校验结果的字符串，检测其总正确平仄数、押韵数、韵种类
+    给定一串汉字，一次性返回对应韵书的平仄代码串，每个字的代码与 hanzi_to_pingze 相同。
     Args:
-        string: 验结果的字符串
+        hanzi_str: 给定的汉字串
+        yun_shu: 使用的韵书代号
+        is_trad: 簡體 or 繁體
     Returns:
-        返回三个值：
-            总正确平仄数
-            押韵数
-            韵种类
-    """
-    matches = re.findall(r'第([一二三四五六七八九十])组韵', string)
-    if matches:
-        yun_nums = [cn_nums[cn_num] for cn_num in matches]
-        yun_types = max(yun_nums)
-    else:
-        yun_types = 1
-    total_count = yayun_count = 0
-    lines = string.split('\n')
-    for line in lines:
-        if '□' in line or '■' in line or '〇' in line:
-            total_count += line.count('〇') + line.count('◎') + line.count('□')
-        if '不押韵' in line:
-            total_count -= 1
-        if '押韵' in line:
-            yayun_count += 1
-    return total_count, yayun_count, yun_types
+        与汉字串等长的平仄代码串
+    """
+    return hanzi_str.translate(get_pingze_translation(yun_shu))
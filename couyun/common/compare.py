@@ -0,0 +1,161 @@
+"""
+多韵书对照模块。一首诗词同时按平水韵（词为词林正韵）、中华新韵、中华通韵校验：文本处理、词牌与格式的匹配只做一次，
+各韵书的平仄代码串各以一次 str.translate 得到，最后列出各韵书判定不同的字与韵脚。
+"""
+
+from couyun.ci.ci_rhythm import CiRhythm
+from couyun.common.check_result import CheckResult
+from couyun.common.common import hanzi_str_to_pingze
+from couyun.common.formatters import MARK_NAMES, result_to_dict
+from couyun.common.text_proceed import process_text
+from couyun.common.verdict import CiReport
+from couyun.shi.shi_forms import LYU_SHI, VerseForm
+from couyun.shi.shi_rhythm import LENGTH_ERROR, ShiRhythm, is_valid_length
+
+YUN_SHUS = (1, 2, 3)
+
+
+def pingze_columns(text: str, yun_shus: tuple[int, ...], is_trad: bool) -> dict[int, str]:
+    """
+    各韵书的平仄代码串，每部韵书以 str.translate 一次得到。
+    Args:
+        text: 处理后的诗词文本
+        yun_shus: 韵书代码
+        is_trad: 簡體 or 繁體
+    Returns:
+        韵书代码到与 text 等长的平仄代码串的字典
+    """
+    return {yun_shu: hanzi_str_to_pingze(text, yun_shu, is_trad) for yun_shu in yun_shus}
+
+
+class RhymeBookComparison:
+    """一首诗词在各韵书下的校验结果与差异"""
+
+    def __init__(self, text: str, results: dict[int, CheckResult | int], pingze: dict[int, str]):
+        """
+        Args:
+            text: 处理后的诗词文本
+            results: 韵书代码到校验结果或错误码的字典
+            pingze: 韵书代码到平仄代码串的字典
+        """
+        self.text = text
+        self.results = results
+        self.pingze = pingze
+
+    def _marks(self, yun_shu: int) -> str | None:
+        """某韵书的结果中逐字判定代码串，与 text 等长；校验失败时为 None"""
+        result = self.results[yun_shu]
+        if isinstance(result, int):
+            return None
+        report = result.report
+        if isinstance(report, CiReport):
+            return ''.join(segment.marks for segment in report.segments)
+        return ''.join(line.marks for line in report.lines)
+
+    def _rhymes(self, yun_shu: int) -> dict[int, object]:
+        """某韵书的结果中各韵脚在 text 中的位置到韵脚判定的字典"""
+        result = self.results[yun_shu]
+        if isinstance(result, int):
+            return {}
+        report = result.report
+        if isinstance(report, CiReport):
+            rhymes = {}
+            pos = 0
+            for segment in report.segments:
+                pos += len(segment.marks)
+                rhymes[pos - 1] = segment.yun
+            return rhymes
+        return {line.index * report.sen_len + report.sen_len - 1: line.yun
+                for line in report.lines if line.yun is not None}
+
+    def diff(self) -> list[dict]:
+        """
+        各韵书平仄代码或判定不同的字。
+        Returns:
+            每个字一项：位置、字，以及各韵书的平仄代码与判定（校验失败时判定为 None）
+        """
+        marks = {yun_shu: self._marks(yun_shu) for yun_shu in self.results}
+        diffs = []
+        for index, hanzi in enumerate(self.text):
+            codes = {yun_shu: self.pingze[yun_shu][index] for yun_shu in self.results}
+            verdicts = {yun_shu: None if marks[yun_shu] is None or index >= len(marks[yun_shu])
+                        else MARK_NAMES[marks[yun_shu][index]] for yun_shu in self.results}
+            if len(set(codes.values())) > 1 or len(set(verdicts.values())) > 1:
+                diffs.append({'index': index, 'hanzi': hanzi, 'pingze': codes, 'verdicts': verdicts})
+        return diffs
+
+    def rhyme_diff(self) -> list[dict]:
+        """
+        各韵书押韵判定不同的韵脚。
+        Returns:
+            每个韵脚一项：位置、字，以及各韵书的押韵判定（不是韵脚或校验失败时为 None）
+        """
+        rhymes = {yun_shu: self._rhymes(yun_shu) for yun_shu in self.results}
+        positions = sorted(set().union(*rhymes.values()))
+        diffs = []
+        for index in positions:
+            status = {}
+            for yun_shu in self.results:
+                yun = rhymes[yun_shu].get(index)
+                status[yun_shu] = None if yun is None else 'unknown' if yun.unknown else yun.status
+            if len(set(status.values())) > 1:
+                diffs.append({'index': index, 'hanzi': self.text[index], 'status': status})
+        return diffs
+
+    def to_dict(self) -> dict:
+        """并列的各韵书结果与差异，可直接序列化为 JSON"""
+        return {
+            'text': self.text,
+            'results': {yun_shu: result_to_dict(result) for yun_shu, result in self.results.items()},
+            'diff': self.diff(),
+            'rhyme_diff': self.rhyme_diff(),
+        }
+
+
+def compare_shi(text: str, is_trad: bool, yun_shus: tuple[int, ...] = YUN_SHUS,
+                forms: tuple[VerseForm, ...] = LYU_SHI) -> RhymeBookComparison:
+    """
+    以多部韵书校验一首诗。
+    Args:
+        text: 输入的诗，可以带标点
+        is_trad: 簡體 or 繁體
+        yun_shus: 韵书代码
+        forms: 校验的诗体，见 couyun.shi.shi_forms
+    Returns:
+        各韵书的结果与差异；字数不正确时各韵书的结果均为 LENGTH_ERROR
+    """
+    poem, comma_pos = process_text(text)
+    pingze = pingze_columns(poem, yun_shus, is_trad)
+    if not is_valid_length(len(poem), forms):
+        return RhymeBookComparison(poem, dict.fromkeys(yun_shus, LENGTH_ERROR), pingze)
+    shared_cache = {}  # 各韵书平仄相同时，全诗结构与逐句格律只推断一次
+    results = {yun_shu: ShiRhythm(yun_shu, poem, comma_pos, is_trad, pingze[yun_shu], forms,
+                                  shared_cache).check()
+               for yun_shu in yun_shus}
+    return RhymeBookComparison(poem, results, pingze)
+
+
+def compare_ci(text: str, ci_pai_name: str, give_type: str, ci_pu: int, is_trad: bool,
+               yun_shus: tuple[int, ...] = YUN_SHUS) -> RhymeBookComparison:
+    """
+    以多部韵书校验一首词，词牌与格式的匹配只做一次。
+    Args:
+        text: 输入的词，可以带标点
+        ci_pai_name: 词牌名，可以为空
+        give_type: 指定的格式序号，可以为空
+        ci_pu: 词谱代码
+        is_trad: 簡體 or 繁體
+        yun_shus: 韵书代码
+    Returns:
+        各韵书的结果与差异
+    """
+    content, comma_pos = process_text(text)
+    pingze = pingze_columns(content, yun_shus, is_trad)
+    candidates = None
+    results = {}
+    for yun_shu in yun_shus:
+        ci = CiRhythm(yun_shu, ci_pai_name, content, comma_pos, give_type, ci_pu, is_trad, pingze[yun_shu])
+        if candidates is None:
+            candidates = ci.candidates()
+        results[yun_shu] = ci.check(candidates)
+    return RhymeBookComparison(content, results, pingze)
@@ -0,0 +1,381 @@
+"""
+校验结果输出模块。根据 couyun.common.verdict 中的判定生成文本、JSON、NDJSON、HTML 等格式的结果，
+只对最终选中的候选调用，各格式共用同一份判定。
+"""
+
+import html
+import json
+import math
+
+import couyun.rhythm.new_rhythm as nw
+from couyun.common.num_to_cn import num_to_cn
+from couyun.common.verdict import CiReport, ShiReport, YunVerdict, YUN_LIN
+from couyun.rhythm.pingshui_rhythm import cilin_part_names, rhythm_name, rhythm_name_trad
+
+# 逐字判定代码对应的展示符号：对、错、多音、生僻
+MARK_SHOW = {'0': '〇', '1': '●', '2': '◎', '3': '✕'}
+# 水龙吟格二十四末字按平仄代码展示的符号
+LAST_MARK_SHOW = ['◎', '●', '〇', '�']
+
+_ci_trad_map = str.maketrans("换叠读举儿韵", "換疊讀舉兒韻")
+
+
+def _poem_type_name(total_lines: int, is_trad: bool) -> str:
+    """总行数 -> 诗体中文名"""
+    if total_lines == 4:
+        return '絕句' if is_trad else '绝句'
+    if total_lines == 8:
+        return '律詩' if is_trad else '律诗'
+    return '排律'
+
+
+def _shi_form_name(report: ShiReport) -> str:
+    """诗体全称，如五言绝句、七言古绝"""
+    return f'{num_to_cn(report.sen_len)}言{report.kind or _poem_type_name(len(report.lines), report.is_trad)}'
+
+
+def _ao_word(ao: int, is_trad: bool) -> str:
+    """拗句代码 -> 拗句提示词"""
+    if ao == 2:
+        return '“中仄中仄仄”拗句，為對句相救。' if is_trad else "“中仄中仄仄”拗句。为对句相救。"
+    if ao == 1:
+        return "“平平仄平仄”拗句，為本句自救。" if is_trad else "“平平仄平仄”拗句，为本句自救。"
+    return ''
+
+
+def shi_yun_names(yun: YunVerdict, yun_shu: int, is_trad: bool) -> list[str]:
+    """诗的韵脚字各韵部的汉字名，不知韵部时为空列表或含“？”"""
+    if yun_shu == 1:
+        using_name = ''.join(rhythm_name_trad if is_trad else rhythm_name)
+        return [using_name[_ - 1] for _ in yun.yun_list]
+    if yun.yun_list == [107]:
+        return []
+    if yun_shu == 2:
+        using_name = ''.join(nw.xin_hanzi_trad if is_trad else nw.xin_hanzi)
+    else:
+        using_name = ''.join(nw.tong_hanzi_trad if is_trad else nw.tong_hanzi)
+    return [using_name[int(math.fabs(_)) - 1] for _ in yun.yun_list]
+
+
+def _shi_yun_text(yun: YunVerdict, yun_shu: int, is_trad: bool) -> str:
+    """诗的韵脚展示文本"""
+    yun_word = '韻' if is_trad else '韵'
+    if yun.unknown:
+        return f'不知{yun_word}部'  # 生僻字处理模块
+    lin = '鄰' if is_trad else '邻'
+    names = '、'.join(shi_yun_names(yun, yun_shu, is_trad))
+    if yun.status == YUN_LIN:
+        return f'{names}{yun_word} 用{lin}韵 押{yun_word} '
+    return f'{names}{yun_word} {"" if yun.is_yayun else "不"}押{yun_word} '
+
+
+def format_shi_text(report: ShiReport) -> str:
+    """
+    生成诗的校验结果文本。
+    Args:
+        report: 诗的判定
+    Returns:
+        结果文本
+    """
+    is_trad = report.is_trad
+    lian = "聯" if is_trad else '联'
+    parts = [f'{_shi_form_name(report)}\n']
+    for group in report.groups():
+        hint_buf = sen_buf = ge_buf = ao_buf = ''
+        for line in group:
+            hint_buf += line.rule.translate(str.maketrans('012', '中平仄')) + '\u3000'
+            sen_buf += line.sentence + '\u3000'
+            if line.ao:
+                ao_buf += f'\n本{lian}{"上" if line.index % 2 == 0 else "下"}句' + _ao_word(line.ao, is_trad)
+            ge_buf += ''.join(MARK_SHOW[m] for m in line.marks) + '\u3000'
+        yun = group[-1].yun
+        yun_info = _shi_yun_text(yun, report.yun_shu, is_trad)
+        # 在句尾标记押韵或不押韵
+        if '不押韵' in yun_info:
+            ge_buf = ge_buf[:-2] + '■'
+        elif '不' not in yun_info:
+            ge_buf = ge_buf[:-2] + '□'
+        parts.append(f'\n{hint_buf}\n{sen_buf}{yun_info}\n{ge_buf}{ao_buf}\n')
+    return ''.join(parts)
+
+
+def ci_yun_names(yun_list: list[int], yun_shu: int, is_trad: bool) -> str:
+    """
+    将数字表示的韵部转换为汉字表示的韵部
+    Args:
+        yun_list: 单个字的韵数字代码列表
+        yun_shu: 使用韵书的代码
+        is_trad: 簡體 or 繁體
+    Returns:
+        汉字表示的韵部
+    """
+    if yun_shu == 1:
+        part_names = cilin_part_names[bool(is_trad)]
+        return '、'.join(part_names[i] for i in yun_list)
+    elif yun_shu == 2:
+        using_xin = nw.xin_hanzi_trad if is_trad else nw.xin_hanzi
+        return nw.show_yun(yun_list, nw.xin_yun, using_xin)
+    using_tong = nw.tong_hanzi_trad if is_trad else nw.tong_hanzi
+    return nw.show_yun(yun_list, nw.tong_yun, using_tong)
+
+
+def _ci_yun_text(yun: YunVerdict, yun_shu: int, is_trad: bool) -> str:
+    """把单个韵脚的判定变成人类可读串。"""
+    if yun.unknown:
+        return '不知韻部' if is_trad else '不知韵部'
+    hanzi_yun = ci_yun_names(yun.yun_list, yun_shu, is_trad)
+    group = f'第{num_to_cn(yun.group)}組韻' if is_trad else f"第{num_to_cn(yun.group)}组韵"
+    yayun = '' if yun.is_yayun else '不'
+    return f'{hanzi_yun} {group} {yayun}押韻' if is_trad else f'{hanzi_yun} {group} {yayun}押韵'
+
+
+def _ci_marks_show(text: str, marks: str) -> str:
+    """按片段内容的分句，将逐字判定代码转换为展示符号"""
+    converted = []
+    j = 0
+    for char in text:
+        if char == '\u3000':
+            converted.append('\u3000')
+        else:
+            converted.append(MARK_SHOW[marks[j]])
+            j += 1
+    return ''.join(converted)
+
+
+def format_ci_text(report: CiReport) -> str:
+    """
+    生成词的一种格式的校验结果文本，不含词牌名等提示。
+    Args:
+        report: 词的判定
+    Returns:
+        结果文本
+    """
+    lines = [f'你的格式为 格{num_to_cn(report.fmt_id + 1)}', '']
+    for segment in report.segments:
+        yun_info = _ci_yun_text(segment.yun, report.yun_shu, report.is_trad)
+        lines.append(segment.ge.translate(_ci_trad_map) if report.is_trad else segment.ge)
+        lines.append(segment.text + '\u3000' + yun_info)
+        mark_line = _ci_marks_show(segment.text, segment.marks)
+        if segment.yun.unknown:
+            lines += [mark_line, '']
+        elif not segment.yun.is_yayun or mark_line[-1] == '●':
+            lines += [mark_line[:-1] + '■', '']
+        else:
+            lines += [mark_line[:-1] + '□', '']
+    text = '\n'.join(lines).rstrip() + '\n'
+    # 水龙吟格二十四特殊处理
+    if report.last_mark is not None:
+        text += ''.join(line + '\n' for line in ['', '仄句', report.text[-1], LAST_MARK_SHOW[int(report.last_mark)]])
+    return text
+
+
+# =========================
+# 结构化输出：JSON、NDJSON、HTML
+# =========================
+MARK_NAMES = {'0': 'right', '1': 'wrong', '2': 'duo', '3': 'pi'}
+MARK_TITLES = {
+    False: {'0': '平仄正确', '1': '平仄错误', '2': '多音字', '3': '生僻字'},
+    True: {'0': '平仄正確', '1': '平仄錯誤', '2': '多音字', '3': '生僻字'},
+}
+
+
+def _chars_dict(text: str, marks: str) -> list[dict]:
+    """逐字判定，text 中的全角空格不计"""
+    return [{'hanzi': hanzi, 'verdict': MARK_NAMES[mark]}
+            for hanzi, mark in zip(text.replace('\u3000', ''), marks)]
+
+
+def _yun_status(yun: YunVerdict) -> str:
+    return 'unknown' if yun.unknown else yun.status
+
+
+def _shi_to_dict(report: ShiReport) -> dict:
+    is_trad = report.is_trad
+    lines = []
+    for line in report.lines:
+        line_dict = {
+            'index': line.index,
+            'text': line.sentence,
+            'pattern': line.rule.translate(str.maketrans('012', '中平仄')),
+            'chars': _chars_dict(line.sentence, line.marks),
+            'ao': line.ao,
+            'ao_note': _ao_word(line.ao, is_trad) or None,
+            'rhyme': None,
+        }
+        if line.yun is not None:
+            line_dict['rhyme'] = {
+                'hanzi': line.yun.hanzi,
+                'yun': list(line.yun.yun_list),
+                'names': shi_yun_names(line.yun, report.yun_shu, is_trad),
+                'status': _yun_status(line.yun),
+            }
+        lines.append(line_dict)
+    return {
+        'kind': 'shi',
+        'form': _shi_form_name(report),
+        'sen_len': report.sen_len,
+        'yun_shu': report.yun_shu,
+        'main_rhythm': report.main_rhythm,
+        'lines': lines,
+        'rhyme_groups': [{'lines': [line.index for line in group], 'hanzi': group[-1].yun.hanzi}
+                         for group in report.groups()],
+    }
+
+
+def _ci_to_dict(report: CiReport) -> dict:
+    is_trad = report.is_trad
+    segments = []
+    for segment in report.segments:
+        names = '' if segment.yun.unknown else ci_yun_names(segment.yun.yun_list, report.yun_shu, is_trad)
+        segments.append({
+            'pattern': segment.ge.translate(_ci_trad_map) if is_trad else segment.ge,
+            'text': segment.text.split('\u3000'),
+            'chars': _chars_dict(segment.text, segment.marks),
+            'rhyme': {
+                'hanzi': segment.yun.hanzi,
+                'yun': list(segment.yun.yun_list),
+                'names': names.split('、') if names else [],
+                'group': segment.yun.group,
+                'xie_yun': segment.yun.xie_yun,
+                'status': _yun_status(segment.yun),
+            },
+        })
+    groups = {}
+    for yun in report.yun:
+        groups.setdefault(yun.group, []).append(yun.hanzi)
+    return {
+        'kind': 'ci',
+        'cipai': report.name,
+        'cipai_num': report.ci_num,
+        'format': report.fmt_id + 1,
+        'given_type_mismatch': report.warn,
+        'yun_shu': report.yun_shu,
+        'segments': segments,
+        'rhyme_groups': [{'group': group, 'hanzi': hanzis} for group, hanzis in groups.items()],
+        'last_char': None if report.last_mark is None else {
+            'hanzi': report.text[-1], 'pingze': report.last_mark},
+    }
+
+
+def result_to_dict(result) -> dict:
+    """
+    校验结果转换为可序列化的字典。
+    Args:
+        result: CheckResult，或校验失败时的错误码
+    Returns:
+        包含逐字平仄判定、韵脚与押韵分组、匹配的格式、拗救提示的字典；错误码转换为 {'error': 错误码}
+    """
+    if isinstance(result, int):
+        return {'error': result}
+    report = result.report
+    data = _shi_to_dict(report) if isinstance(report, ShiReport) else _ci_to_dict(report)
+    data['score'] = {'count': result.count, 'yayun_count': result.yayun_count, 'yun_types': result.yun_types}
+    return data
+
+
+def format_text(result) -> str:
+    """原有的文本结果，错误码原样返回"""
+    if isinstance(result, int):
+        return result
+    return result.text
+
+
+def format_json(result, indent: int = None) -> str:
+    """JSON 文档"""
+    return json.dumps(result_to_dict(result), ensure_ascii=False, indent=indent)
+
+
+def iter_ndjson(results):
+    """
+    逐个结果生成 NDJSON 的一行，适合批量校验时流式输出。
+    Args:
+        results: CheckResult 或错误码的可迭代对象
+    Yields:
+        每个结果一行 JSON，以换行结尾
+    """
+    for result in results:
+        yield format_json(result) + '\n'
+
+
+def format_ndjson(results) -> str:
+    """多个结果的 NDJSON 文本"""
+    return ''.join(iter_ndjson(results))
+
+
+def _html_chars(text: str, marks: str, is_trad: bool) -> str:
+    spans = []
+    j = 0
+    for char in text:
+        if char == '\u3000':
+            spans.append('<span class="couyun-sep">\u3000</span>')
+            continue
+        mark = marks[j]
+        spans.append(f'<span class="couyun-{MARK_NAMES[mark]}" title="{MARK_TITLES[is_trad][mark]}">'
+                     f'{html.escape(char)}</span>')
+        j += 1
+    return ''.join(spans)
+
+
+def _html_yun(yun_info: str, yun: YunVerdict) -> str:
+    return f'<span class="couyun-yun couyun-yun-{_yun_status(yun)}">{html.escape(yun_info.strip())}</span>'
+
+
+def format_html(result) -> str:
+    """
+    HTML 片段，每个字以 span 标注判定，类名为 couyun-right、couyun-wrong、couyun-duo、couyun-pi，样式由页面给出。
+    错误码转换为带 data-error 属性的空 div。
+    """
+    if isinstance(result, int):
+        return f'<div class="couyun-result couyun-error" data-error="{result}"></div>'
+    report = result.report
+    is_trad = report.is_trad
+    parts = []
+    if isinstance(report, ShiReport):
+        data = _shi_to_dict(report)
+        parts.append(f'<div class="couyun-result couyun-shi">\n<h3>{html.escape(data["form"])}</h3>')
+        for group in report.groups():
+            parts.append('<div class="couyun-group">')
+            for line in group:
+                row = [f'<span class="couyun-pattern">{data["lines"][line.index]["pattern"]}</span>',
+                       f'<span class="couyun-text">{_html_chars(line.sentence, line.marks, is_trad)}</span>']
+                if line.yun is not None:
+                    row.append(_html_yun(_shi_yun_text(line.yun, report.yun_shu, is_trad), line.yun))
+                if line.ao:
+                    row.append(f'<span class="couyun-ao">{html.escape(_ao_word(line.ao, is_trad))}</span>')
+                parts.append(f'<p class="couyun-line">{"".join(row)}</p>')
+            parts.append('</div>')
+    else:
+        parts.append('<div class="couyun-result couyun-ci">')
+        if report.name:
+            parts.append(f'<h3>{html.escape(report.name)}</h3>')
+        parts.append(f'<p class="couyun-format">格{num_to_cn(report.fmt_id + 1)}</p>')
+        for segment in report.segments:
+            ge = segment.ge.translate(_ci_trad_map) if is_trad else segment.ge
+            parts.append(f'<div class="couyun-group">\n<p class="couyun-pattern">{html.escape(ge)}</p>\n'
+                         f'<p class="couyun-line"><span class="couyun-text">'
+                         f'{_html_chars(segment.text, segment.marks, is_trad)}</span>'
+                         f'{_html_yun(_ci_yun_text(segment.yun, report.yun_shu, is_trad), segment.yun)}</p>\n</div>')
+    parts.append('</div>')
+    return '\n'.join(parts) + '\n'
+
+
+FORMATTERS = {
+    'text': format_text,
+    'json': format_json,
+    'ndjson': lambda result: format_ndjson([result]),
+    'html': format_html,
+}
+
+
+def format_result(result, fmt: str = 'text'):
+    """
+    以指定格式输出校验结果，各格式都只读取同一份判定，不重新校验。
+    Args:
+        result: ShiRhythm.check 或 CiRhythm.check 的返回值
+        fmt: 'text'、'json'、'ndjson' 或 'html'
+    Returns:
+        输出内容；text 格式下错误码原样返回
+    """
+    if fmt not in FORMATTERS:
+        raise ValueError(f'不支持的输出格式：{fmt}')
+    return FORMATTERS[fmt](result)
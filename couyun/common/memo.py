@@ -0,0 +1,87 @@
+"""
+查字结果缓存模块。hanzi_rhythm 等较慢的查询函数的结果只取决于参数，一首诗的校验中同一个字会被反复查询，
+此处以 functools.lru_cache 保存结果，统计信息即 lru_cache 的 cache_info()。
+只查一次字典的函数不必缓存，缓存本身的开销反而更大。
+"""
+
+import inspect
+from functools import lru_cache, wraps
+
+DEFAULT_MAXSIZE = 4096
+
+_memos = {}
+
+
+class _FrozenList(tuple):
+    """缓存中保存的列表结果，取出时还原为新的列表"""
+
+
+def lru_memo(maxsize: int = DEFAULT_MAXSIZE):
+    """
+    以 LRU 缓存包装函数的装饰器，被包装的函数登记在本模块中，可统一查看统计或清空。
+    位置参数与关键字参数先统一为完整的位置参数，f('东', 1) 与 f('东', yun_shu=1) 共用同一条缓存。
+    结果为列表时缓存中保存为元组，每次返回新的列表，调用者修改返回值不会影响缓存。
+    Args:
+        maxsize: 缓存结果数的上限
+    Returns:
+        装饰器
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        params = tuple(signature.parameters.values())
+        if any(param.kind not in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD) for param in params):
+            raise TypeError(f'lru_memo 只支持参数均可按位置传入的函数: {func.__qualname__}')
+        names = tuple(param.name for param in params)
+        defaults = tuple(param.default for param in params)
+        required = sum(default is inspect.Parameter.empty for default in defaults)
+
+        @lru_cache(maxsize)
+        def cached(*args):
+            result = func(*args)
+            return _FrozenList(result) if type(result) is list else result
+
+        def positional(args: tuple, kwargs: dict) -> tuple:
+            """按函数签名补全为完整的位置参数，参数不合法时由 signature.bind 抛出 TypeError"""
+            if len(args) > len(names):
+                signature.bind(*args, **kwargs)
+            rest = dict(kwargs)
+            values = list(args)
+            for name, default in zip(names[len(args):], defaults[len(args):]):
+                value = rest.pop(name, default)
+                if value is inspect.Parameter.empty:
+                    signature.bind(*args, **kwargs)
+                values.append(value)
+            if rest:
+                signature.bind(*args, **kwargs)
+            return tuple(values)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if kwargs or not required <= len(args) <= len(names):
+                args = positional(args, kwargs)
+            elif len(args) < len(names):
+                args += defaults[len(args):]
+            result = cached(*args)
+            return list(result) if type(result) is _FrozenList else result
+
+        wrapper.cache_info = cached.cache_info
+        wrapper.cache_clear = cached.cache_clear
+        _memos[f'{func.__module__}.{func.__qualname__}'] = wrapper
+        return wrapper
+
+    return decorator
+
+
+def memo_stats() -> dict[str, dict]:
+    """
+    所有缓存的统计信息。
+    Returns:
+        函数全名到统计信息的字典，即 cache_info() 的 hits、misses、maxsize、currsize
+    """
+    return {name: wrapper.cache_info()._asdict() for name, wrapper in _memos.items()}
+
+
+def clear_memos() -> None:
+    """清空所有缓存与计数"""
+    for wrapper in _memos.values():
+        wrapper.cache_clear()
@@ -1,8 +1,17 @@
 """数字转汉字模块，由于放入common模块会导致循环import，单独置于此处。"""
 
+CN_TABLE_SIZE = 1000  # 韵部、组、格等编号都远小于此数，直接查表
+
 
 def num_to_cn(num: int) -> str:
     """输入数字，将数字转换为对应的汉字"""
+    if 0 <= num < CN_TABLE_SIZE:
+        return _cn_table[num]
+    return _convert(num)
+
+
+def _convert(num: int) -> str:
+    """逐位转换数字"""
     chinese_nums = {0: '零', 1: '一', 2: '二', 3: '三', 4: '四',
                     5: '五', 6: '六', 7: '七', 8: '八', 9: '九'}
 
@@ -26,3 +35,6 @@ def num_to_cn(num: int) -> str:
         result = result[1:]
 
     return result
+
+
+_cn_table = [_convert(i) for i in range(CN_TABLE_SIZE)]
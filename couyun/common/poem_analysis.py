@@ -0,0 +1,87 @@
+"""
+诗词逐字分析模块。一首诗词的平仄代码、韵部、多音等信息只查询一次，供校验中的各个步骤与各种候选格式共用。
+"""
+
+from couyun.common.common import hanzi_str_to_pingze, hanzi_to_pingze, hanzi_to_yun
+from couyun.rhythm.yun_mask import get_yun_masks
+
+
+class PoemAnalysis:
+    """
+    一首诗词的逐字分析结果。平仄代码在建立时一次性得到；韵部只有韵脚需要，第一次用到某字时查询并保存。
+    同一个字在诗中出现多次时只查询一次。
+    """
+
+    def __init__(self, poem: str, yun_shu: int, is_trad: bool, pingze: str = None):
+        """
+        Args:
+            poem: 处理后的诗词文本，不含符号
+            yun_shu: 使用韵书的代码
+            is_trad: 簡體 or 繁體
+            pingze: 预先得到的平仄代码串，不给则现场查询
+        """
+        self.poem = poem
+        self.yun_shu = yun_shu
+        self.is_trad = is_trad
+        self.pingze = pingze or hanzi_str_to_pingze(poem, yun_shu, is_trad)  # 与 poem 等长的平仄代码串
+        self._codes = dict(zip(poem, self.pingze))
+        # 不能作平（仄、生僻）与不能作仄（平、生僻）的字的位掩码，第 i 位对应诗中第 i 个字
+        self.not_ping = self._code_mask('23')
+        self.not_ze = self._code_mask('13')
+        self._masks = {}
+        self._yun_lists = {}
+
+    def _code_mask(self, codes: str) -> int:
+        bits = self.pingze.translate(str.maketrans('0123', ''.join('1' if c in codes else '0' for c in '0123')))
+        return int(bits[::-1], 2) if bits else 0
+
+    def pingze_of(self, hanzi: str) -> str:
+        """
+        一个字的平仄代码，与 hanzi_to_pingze 相同。
+        Args:
+            hanzi: 诗中的一个字，也可以是其他字符串
+        Returns:
+            平仄代码 0多音 1平 2仄 3生僻
+        """
+        code = self._codes.get(hanzi)
+        if code is None:
+            code = self._codes[hanzi] = hanzi_to_pingze(hanzi, self.yun_shu, self.is_trad)
+        return code
+
+    def is_duo_yin(self, hanzi: str) -> bool:
+        """一个字是否为多音字"""
+        return self.pingze_of(hanzi) == '0'
+
+    def sentence_pingze(self, start: int, end: int) -> str:
+        """诗中 [start, end) 部分的平仄代码串"""
+        return self.pingze[start: end]
+
+    def sentence_masks(self, start: int, end: int) -> tuple[int, int, int]:
+        """
+        诗中 [start, end) 部分的平仄位掩码，第 i 位对应该部分的第 i 个字。
+        Returns:
+            不能作平的位掩码，不能作仄的位掩码，字数
+        """
+        length = len(self.pingze[start: end])
+        window = (1 << length) - 1
+        return (self.not_ping >> start) & window, (self.not_ze >> start) & window, length
+
+    def yun_masks(self, hanzi: str) -> tuple[int, ...]:
+        """一个字的多层韵部位掩码，与 get_yun_masks 相同"""
+        masks = self._masks.get(hanzi)
+        if masks is None:
+            masks = self._masks[hanzi] = get_yun_masks(hanzi, self.yun_shu)
+        return masks
+
+    def yun_list(self, hanzi: str) -> list[int]:
+        """
+        一个字的韵部列表，与 hanzi_to_yun 相同。
+        Args:
+            hanzi: 诗中的一个字
+        Returns:
+            韵部列表，每次返回新的列表
+        """
+        yun_list = self._yun_lists.get(hanzi)
+        if yun_list is None:
+            yun_list = self._yun_lists[hanzi] = tuple(hanzi_to_yun(hanzi, self.yun_shu, self.is_trad))
+        return list(yun_list)
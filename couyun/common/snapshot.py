@@ -0,0 +1,112 @@
+"""
+索引快照模块。由韵表建立的各种索引在第一次建立后以 marshal 格式存入缓存目录，之后启动时直接读取。
+快照文件名中带有韵表源文件与建立索引的代码的哈希值，两者任一改动后哈希值随之改变，旧快照自动失效并重新建立。
+缓存目录默认为用户的缓存目录 CACHE_DIR（如 ~/.cache/couyun），可通过环境变量 COUYUN_CACHE_DIR 或 set_cache_dir 修改，
+设为空则不使用快照。
+"""
+
+import hashlib
+import marshal
+import os
+import sys
+
+from couyun import CACHE_DIR, COMMON_DIR, HANZI_DIR, PINYIN_LEXICON, RHYTHM_DIR
+
+SNAPSHOT_VERSION = 1
+
+# 索引所依据的韵表源文件
+SOURCE_FILES = [os.path.join(HANZI_DIR, 'hanzi_class.py'), os.path.join(HANZI_DIR, 'hanzi_pinyin_class.py'),
+                PINYIN_LEXICON]
+# 建立索引的代码所在的模块，改动建立索引的函数后不必手动修改 SNAPSHOT_VERSION
+BUILDER_FILES = [
+    *(os.path.join(COMMON_DIR, name) for name in ('common.py', 'num_to_cn.py', 'snapshot.py')),
+    os.path.join(HANZI_DIR, 'pinyin_lexicon.py'),
+    *(os.path.join(RHYTHM_DIR, name) for name in ('new_rhythm.py', 'pingshui_rhythm.py', 'pingze_table.py',
+                                                  'registry.py', 'yun_index.py', 'yun_mask.py')),
+]
+
+_cache_dir = os.environ.get('COUYUN_CACHE_DIR', CACHE_DIR)
+_source_hash = None
+
+
+def set_cache_dir(path: str | None) -> None:
+    """
+    设置快照缓存目录。
+    Args:
+        path: 缓存目录，为 None 或空字符串时不使用快照
+    """
+    global _cache_dir
+    _cache_dir = path
+
+
+def get_cache_dir() -> str | None:
+    """当前的快照缓存目录，供子进程沿用"""
+    return _cache_dir
+
+
+def source_hash() -> str | None:
+    """
+    计算韵表源文件与建立索引的代码的哈希值，每个进程只计算一次。
+    Returns:
+        十六进制哈希值，源文件无法读取（如打包后的程序）时返回 None
+    """
+    global _source_hash
+    if _source_hash is None:
+        digest = hashlib.sha256(f'{SNAPSHOT_VERSION}:{sys.version_info[0]}.{sys.version_info[1]}'.encode())
+        try:
+            for path in SOURCE_FILES + BUILDER_FILES:
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+        except OSError:
+            _source_hash = ''
+        else:
+            _source_hash = digest.hexdigest()[:16]
+    return _source_hash or None
+
+
+def _snapshot_path(name: str) -> str | None:
+    content_hash = source_hash()
+    if not _cache_dir or not content_hash:
+        return None
+    return os.path.join(_cache_dir, f'{name}-{content_hash}.marshal')
+
+
+def _write_snapshot(path: str, name: str, data) -> None:
+    """写入快照并删除同名的旧快照，写入失败时静默放弃"""
+    try:
+        os.makedirs(_cache_dir, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(marshal.dumps(data))
+        os.replace(tmp_path, path)
+        for file_name in os.listdir(_cache_dir):
+            old_path = os.path.join(_cache_dir, file_name)
+            if file_name.startswith(f'{name}-') and file_name.endswith('.marshal') and old_path != path:
+                os.remove(old_path)
+    except OSError:
+        pass
+
+
+def load_snapshot(name: str, build, encode=None, decode=None):
+    """
+    读取快照，快照不存在或已失效时建立索引并写入快照。
+    Args:
+        name: 快照名
+        build: 无参数的索引建立函数
+        encode: 将索引转换为 marshal 支持的类型的函数，不给则直接保存
+        decode: 将快照内容还原为索引的函数，不给则直接使用
+    Returns:
+        索引
+    """
+    path = _snapshot_path(name)
+    if path is not None:
+        try:
+            with open(path, 'rb') as f:
+                data = marshal.loads(f.read())  # 整体读入后再解析，比 marshal.load 逐段读取快得多
+            return decode(data) if decode else data
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+    result = build()
+    if path is not None:
+        _write_snapshot(path, name, encode(result) if encode else result)
+    return result
@@ -1,22 +1,22 @@
-import re
+import unicodedata
 
 # =========================
 # 1. 显式定义“符号”的 Unicode 区间（白名单）
 # =========================
-SYMBOL_PATTERN = re.compile(
-    r"["
-    r"\u2000-\u206F"   # General Punctuation
-    r"\u3000-\u303F"   # CJK 标点
-    r"\uFF00-\uFFEF"   # 全角符号
-    r"\u2600-\u26FF"   # 杂项符号
-    r"\u2700-\u27BF"   # Dingbats
-    r"\u2460-\u2473"   # ①-⑳ 带圈数字
-    r"\u2776-\u277F"   # ❶-❿ 带圈数字（黑底）
-    r"\u2474-\u2487"   # ⑴-⒇ 带括号数字
-    r"!\"#$%&'()*+,-./:;<=>?@[\\\]^_`{|}~"
-    r"\r\t\v\f"      # 控制字符
-    r" \u3000"         # 半角空格 + 全角空格
-    r"]"
+SYMBOL_RANGES = [
+    (0x2000, 0x206F),  # General Punctuation
+    (0x3000, 0x303F),  # CJK 标点
+    (0xFF00, 0xFFEF),  # 全角符号
+    (0x2600, 0x26FF),  # 杂项符号
+    (0x2700, 0x27BF),  # Dingbats
+    (0x2460, 0x2473),  # ①-⑳ 带圈数字
+    (0x2776, 0x277F),  # ❶-❿ 带圈数字（黑底）
+    (0x2474, 0x2487),  # ⑴-⒇ 带括号数字
+]
+SYMBOL_CHARS = (
+    "!\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~"
+    "\r\t\v\f"   # 控制字符
+    " \u3000"     # 半角空格 + 全角空格
 )
 
 # =========================
@@ -28,57 +28,118 @@ PAIRED_SYMBOLS = [
     ("<", ">"), ("《", "》"), ("【", "】"), ("（", "）")
 ]
 
+LEFT_BRACKETS = "([{（【<"
+RIGHT_BRACKETS = ")]}）】>"
 
-def remove_any_brackets_content(text: str) -> str:
-    """
-    删除任意类型括号及其内部内容（支持中英文、混用、非规范嵌套）
-    只要遇到左括号就进入“丢弃模式”，直到遇到任意右括号为止
-    """
-    text = text.replace("\n", "。")
-    left_brackets = set("([{（【<")
-    right_brackets = set(")]}）】>")
+# =========================
+# 字符分类表：BMP 中每个码位一个字节，处理文本时逐字查表，不再使用正则
+# =========================
+CHAR_NORMAL, CHAR_SYMBOL, CHAR_DROP, CHAR_LEFT, CHAR_RIGHT = range(5)
 
-    result = []
-    in_bracket = False
 
-    for ch in text:
-        if ch in left_brackets:
-            in_bracket = True
-            continue
+def _build_char_classes() -> bytearray:
+    classes = bytearray(0x10000)
+    for start, end in SYMBOL_RANGES:
+        classes[start: end + 1] = bytes([CHAR_SYMBOL]) * (end + 1 - start)
+    for ch in SYMBOL_CHARS + "\n":  # 换行视为句号
+        classes[ord(ch)] = CHAR_SYMBOL
+    for pair in PAIRED_SYMBOLS:
+        for ch in pair:
+            classes[ord(ch)] = CHAR_DROP
+    for ch in LEFT_BRACKETS:
+        classes[ord(ch)] = CHAR_LEFT
+    for ch in RIGHT_BRACKETS:
+        classes[ord(ch)] = CHAR_RIGHT
+    return classes
 
-        if ch in right_brackets:
-            in_bracket = False
-            continue
 
-        if not in_bracket:
-            result.append(ch)
+CHAR_CLASSES = _build_char_classes()
 
-    return "".join(result)
+# =========================
+# 3. 兼容区汉字、康熙部首归一为统一汉字
+# =========================
+# 从别处复制来的文字常落在这些区段中，字形与正常汉字相同，但不在韵书里
+FOLD_RANGES = [
+    (0x2E80, 0x2EFF),    # CJK 部首补充
+    (0x2F00, 0x2FDF),    # 康熙部首
+    (0xF900, 0xFAFF),    # CJK 兼容汉字
+    (0x2F800, 0x2FA1F),  # CJK 兼容汉字补充
+]
 
 
-def is_symbol(ch: str) -> bool:
-    """判断字符是否属于“符号白名单”"""
-    return SYMBOL_PATTERN.match(ch) is not None
+def _is_unified(ch: str) -> bool:
+    cp = ord(ch)
+    return 0x4E00 <= cp <= 0x9FFF or 0x3400 <= cp <= 0x4DBF or 0x20000 <= cp <= 0x3134F
 
 
-def process_text(text: str):
+def _build_fold_table() -> dict[int, str]:
+    """只在导入时调用一次 unicodedata，之后归一只需一次 str.translate"""
+    table = {}
+    for start, end in FOLD_RANGES:
+        for cp in range(start, end + 1):
+            folded = unicodedata.normalize('NFKC', chr(cp))
+            if folded != chr(cp) and len(folded) == 1 and _is_unified(folded):
+                table[cp] = folded
+    return table
+
+
+FOLD_TABLE = _build_fold_table()
+
+
+def fold_text(text: str) -> tuple[str, list[int]]:
+    """
+    将兼容区汉字、康熙部首替换为对应的统一汉字，替换前后长度不变。
+    Args:
+        text: 输入文本
+    Returns:
+        替换后的文本，被替换的字符在文本中的位置
+    """
+    folded = text.translate(FOLD_TABLE)
+    if folded == text:
+        return text, []
+    return folded, [i for i, (ch, folded_ch) in enumerate(zip(text, folded)) if ch != folded_ch]
+
 
-    text = remove_any_brackets_content(text)
+def process_text(text: str):
+    """
+    去除输入文本中的括号内容与符号，兼容区汉字、康熙部首归一为统一汉字。
+    Args:
+        text: 输入文本
+    Returns:
+        处理后的文本，各符号前的字数减一的列表
+    """
+    f_text, symbol_positions, _ = process_text_folded(text)
+    return f_text, symbol_positions
 
-    temp_text = text
-    for left, right in PAIRED_SYMBOLS:
-        temp_text = temp_text.replace(left, "").replace(right, "")
 
+def process_text_folded(text: str):
+    """
+    与 process_text 相同，另外返回被归一的字符在处理后文本中的位置，供结果中提示。
+    Args:
+        text: 输入文本
+    Returns:
+        处理后的文本，各符号前的字数减一的列表，被归一的字符位置列表
+    """
+    classes = CHAR_CLASSES
     result_chars = []
     symbol_positions = []
 
+    in_bracket = False
     prev_was_symbol = False
     non_symbol_count = 0  # 已经出现的非符号字符数量
 
-    for ch in temp_text:
-        if is_symbol(ch):
+    # 一次遍历完成：删除括号及其内容，删除成对符号，合并连续符号并记录位置
+    for ch in text:
+        cp = ord(ch)
+        char_class = classes[cp] if cp < 0x10000 else CHAR_NORMAL
+        if char_class == CHAR_LEFT:
+            in_bracket = True
+        elif char_class == CHAR_RIGHT:
+            in_bracket = False
+        elif in_bracket or char_class == CHAR_DROP:
+            continue
+        elif char_class == CHAR_SYMBOL:
             if not prev_was_symbol:
-                result_chars.append(ch)
                 # 记录符号前出现的非符号字符编号
                 # 如果符号在开头，-1 表示前面没有非符号字符
                 symbol_positions.append(non_symbol_count - 1)
@@ -89,7 +150,25 @@ def process_text(text: str):
             non_symbol_count += 1
             prev_was_symbol = False
 
-    final_chars = [ch for ch in result_chars if not is_symbol(ch)]
-    f_text = "".join(final_chars)
+    f_text, folded_positions = fold_text("".join(result_chars))
 
-    return f_text, symbol_positions
+    return f_text, symbol_positions, folded_positions
+
+
+def iter_process_text(stream):
+    """
+    逐首处理文本流，以空行分隔各首诗词，内存中只保留当前一首，适合处理很大的语料文件。
+    Args:
+        stream: 逐行产生文本的可迭代对象，如打开的文本文件
+    Yields:
+        每一首的 (处理后的文本, 各符号前的字数减一的列表)，与对该首调用 process_text 的结果相同
+    """
+    lines = []
+    for line in stream:
+        if line.strip():
+            lines.append(line)
+        elif lines:
+            yield process_text("".join(lines).strip())
+            lines = []
+    if lines:
+        yield process_text("".join(lines).strip())
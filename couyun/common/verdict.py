@@ -0,0 +1,195 @@
+"""
+校验判定模块。校验只得到逐字、逐句的判定，不生成文本；得分由判定直接计算，
+文本等输出格式由 couyun.common.formatters 在需要时根据判定生成。
+"""
+
+from couyun.common.check_result import ScoreCounter
+
+# 逐字判定代码
+MARK_RIGHT = '0'  # 平仄正确
+MARK_WRONG = '1'  # 平仄错误
+MARK_DUO = '2'  # 多音字，无法判断
+MARK_PI = '3'  # 生僻字
+
+# 韵脚判定
+YUN_YA = 'ya'  # 押韵
+YUN_BU = 'bu'  # 不押韵
+YUN_LIN = 'lin'  # 首句用邻韵
+
+
+def pingze_marks(pingze: str, is_valid) -> str:
+    """
+    由平仄代码与逐字的正误得到逐字判定代码。
+    Args:
+        pingze: 平仄代码串，0多音 1平 2仄 3生僻
+        is_valid: 与 pingze 等长的可迭代对象，该字平仄是否符合格律
+    Returns:
+        逐字判定代码串
+    """
+    marks = []
+    for code, valid in zip(pingze, is_valid):
+        if code == '3':
+            marks.append(MARK_PI)
+        elif not valid:
+            marks.append(MARK_WRONG)
+        else:
+            marks.append(MARK_DUO if code == '0' else MARK_RIGHT)
+    return ''.join(marks)
+
+
+class YunVerdict:
+    """一个韵脚字的判定"""
+
+    def __init__(self, hanzi: str, yun_list: list[int], status: str, unknown: bool,
+                 group: int = None, xie_yun: bool = False):
+        """
+        Args:
+            hanzi: 韵脚汉字
+            yun_list: 韵脚字的韵部列表
+            status: YUN_YA、YUN_BU 或 YUN_LIN
+            unknown: 是否不知韵部，此时 status 不展示
+            group: 词中韵脚所属的组号，诗为 None
+            xie_yun: 词中韵脚是否为协韵
+        """
+        self.hanzi = hanzi
+        self.yun_list = yun_list
+        self.status = status
+        self.unknown = unknown
+        self.group = group
+        self.xie_yun = xie_yun
+
+    @property
+    def is_yayun(self) -> bool:
+        return self.status != YUN_BU
+
+
+class ShiLine:
+    """诗中一句的判定"""
+
+    def __init__(self, index: int, sentence: str, rule: str, marks: str, ao: int, yun: YunVerdict = None):
+        """
+        Args:
+            index: 句子在诗中的序号，从 0 开始
+            sentence: 句子内容
+            rule: 匹配的律句格式，0中 1平 2仄
+            marks: 逐字判定代码串
+            ao: 拗句代码，0正常 1平平仄平仄 2中仄中仄仄
+            yun: 韵脚判定，非押韵句为 None
+        """
+        self.index = index
+        self.sentence = sentence
+        self.rule = rule
+        self.marks = marks
+        self.ao = ao
+        self.yun = yun
+
+
+class ShiReport:
+    """一首诗按一种平仄方向校验的判定"""
+
+    def __init__(self, text: str, yun_shu: int, is_trad: bool, sen_len: int, main_rhythm: int,
+                 lines: list[ShiLine], kind: str = None):
+        """
+        Args:
+            text: 处理后的诗
+            yun_shu: 使用韵书的代码
+            is_trad: 簡體 or 繁體
+            sen_len: 句长
+            main_rhythm: 诗所押的韵的数字表示
+            lines: 各句的判定
+            kind: 诗体称谓（如古绝），None 表示按句数称绝句、律诗、排律
+        """
+        self.text = text
+        self.yun_shu = yun_shu
+        self.is_trad = is_trad
+        self.sen_len = sen_len
+        self.main_rhythm = main_rhythm
+        self.lines = lines
+        self.kind = kind
+
+    def groups(self) -> list[list[ShiLine]]:
+        """
+        按韵脚分组的各句，每组以押韵句结尾。最后一个押韵句之后的句子不在任何组中，与文本结果一致。
+        """
+        groups = []
+        current = []
+        for line in self.lines:
+            current.append(line)
+            if line.yun is not None:
+                groups.append(current)
+                current = []
+        return groups
+
+    def score(self) -> ScoreCounter:
+        """由判定直接计算得分，与简繁无关"""
+        score = ScoreCounter()
+        for group in self.groups():
+            yun = group[-1].yun
+            tail = None
+            if not yun.unknown:
+                score.add_yun(yun.is_yayun)
+                tail = '□' if yun.is_yayun else '■'
+            score.add_marks(''.join(line.marks for line in group), tail)
+        return score
+
+
+class CiSegment:
+    """词中一个韵脚分割的片段的判定"""
+
+    def __init__(self, ge: str, text: str, marks: str, yun: YunVerdict):
+        """
+        Args:
+            ge: 词谱中该片段的格律，简体
+            text: 该片段的内容，句间以全角空格分隔
+            marks: 该片段逐字判定代码串，不含空格
+            yun: 片段末韵脚的判定
+        """
+        self.ge = ge
+        self.text = text
+        self.marks = marks
+        self.yun = yun
+
+
+class CiReport:
+    """一首词按一个词牌的一种格式校验的判定"""
+
+    def __init__(self, text: str, yun_shu: int, is_trad: bool, ci_num: str, fmt_id: int,
+                 segments: list[CiSegment], yun: list[YunVerdict], last_mark: str = None):
+        """
+        Args:
+            text: 处理后的词内容
+            yun_shu: 使用韵书的代码
+            is_trad: 簡體 or 繁體
+            ci_num: 词牌编号
+            fmt_id: 格式序号，从 0 开始
+            segments: 各片段的判定
+            yun: 所有韵脚的判定
+            last_mark: 水龙吟格二十四末字单独展示的平仄代码，其余为 None
+        """
+        self.text = text
+        self.yun_shu = yun_shu
+        self.is_trad = is_trad
+        self.ci_num = ci_num
+        self.fmt_id = fmt_id
+        self.segments = segments
+        self.yun = yun
+        self.last_mark = last_mark
+        self.name = None  # 词牌名，未给定词牌时由反查得到
+        self.warn = False  # 给定的格式是否与实际不符而另行匹配
+
+    def score(self) -> ScoreCounter:
+        """由判定直接计算得分，与简繁无关"""
+        score = ScoreCounter()
+        for segment in self.segments:
+            yun = segment.yun
+            tail = None
+            if not yun.unknown:
+                score.add_yun(yun.is_yayun)
+                tail = '■' if not yun.is_yayun or segment.marks[-1:] == MARK_WRONG else '□'
+            score.add_marks(segment.marks, tail)
+        for yun in self.yun:
+            if not yun.unknown:
+                score.add_group(yun.group)
+        if self.last_mark == '2':  # 仄句末字为仄，展示为〇
+            score.count += 1
+        return score
@@ -0,0 +1,262 @@
+"""
+拼音词典的二进制编译与读取模块。
+hanzi_pinyin_class.py 中的 pinyin_dict 导入一次需要解析约四万个列表，启动慢且占用内存，
+此处将其编译为紧凑的二进制文件，运行时以 mmap 方式直接读取，不再导入 pinyin_dict。
+文件格式（小端序）：
+    文件头：魔数 b'CYPY'、版本号、韵母数、汉字数、读音序列数、读音数、hanzi_pinyin_class.py 内容的哈希值（8 字节）
+    韵母表：每个韵母 8 字节，ASCII 编码，末尾补零
+    码位表：按码位升序排列的 uint32
+    偏移表：读音序列数 + 1 个 uint32，第 j 个读音序列为读音表中 [偏移[j], 偏移[j + 1]) 的部分
+    序列表：每个汉字一个 uint16，为该字的读音序列编号
+    读音表：每个读音 1 字节，高 7 位为韵母编号，最低位为声调（0 平 1 仄）
+许多汉字的读音完全相同，编译时相同的读音序列只保存一份，多个汉字共用同一个序列编号。
+运行 python -m couyun.hanzi.pinyin_lexicon 可以重新生成二进制文件。读取时若 hanzi_pinyin_class.py 已改动、与文件头中的
+哈希值不符，则发出警告并重新编译，编译结果存入快照缓存目录，不写入包内（包可能装在只读位置）。
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import warnings
+from array import array
+from bisect import bisect_left
+
+from couyun import HANZI_DIR, PINYIN_LEXICON
+
+MAGIC = b'CYPY'
+VERSION = 3
+HEADER = struct.Struct('<4sHHIII8s')
+FINAL_SIZE = 8
+NO_HASH = bytes(8)
+
+# 二进制词典的源文件
+SOURCE_PATH = os.path.join(HANZI_DIR, 'hanzi_pinyin_class.py')
+
+
+def source_digest(path: str = SOURCE_PATH) -> bytes | None:
+    """
+    计算源文件内容的哈希值。
+    Args:
+        path: 源文件路径
+    Returns:
+        8 字节的哈希值，源文件无法读取（如打包后的程序）时返回 None
+    """
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).digest()[:8]
+    except OSError:
+        return None
+
+
+def compile_lexicon(pinyin_dict: dict, digest: bytes | None = None) -> bytes:
+    """
+    将拼音词典编译为二进制格式。
+    Args:
+        pinyin_dict: 汉字到 [[韵母, 声调], ...] 的字典
+        digest: 写入文件头的源文件哈希值，不给则为全零
+    Returns:
+        二进制词典内容
+    """
+    finals = sorted({final for readings in pinyin_dict.values() for final, _ in readings})
+    if len(finals) > 127:
+        raise ValueError(f'韵母种类过多，无法编码: {len(finals)}')
+    final_ids = {final: idx for idx, final in enumerate(finals)}
+
+    codepoints = array('I')
+    seq_ids = array('H')
+    offsets = array('I', [0])
+    readings = bytearray()
+    seqs = {}
+    for hanzi in sorted(pinyin_dict, key=ord):
+        codepoints.append(ord(hanzi))
+        seq = bytes(final_ids[final] << 1 | (1 if tone else 0) for final, tone in pinyin_dict[hanzi])
+        if seq not in seqs:
+            seqs[seq] = len(seqs)
+            readings += seq
+            offsets.append(len(readings))
+        seq_ids.append(seqs[seq])
+    if len(seqs) > 0xFFFF:
+        raise ValueError(f'读音序列种类过多，无法编码: {len(seqs)}')
+    if sys.byteorder != 'little':
+        codepoints.byteswap()
+        offsets.byteswap()
+        seq_ids.byteswap()
+
+    final_table = b''.join(final.encode('ascii').ljust(FINAL_SIZE, b'\0') for final in finals)
+    header = HEADER.pack(MAGIC, VERSION, len(finals), len(codepoints), len(seqs), len(readings), digest or NO_HASH)
+    return header + final_table + codepoints.tobytes() + offsets.tobytes() + seq_ids.tobytes() + bytes(readings)
+
+
+def write_lexicon(pinyin_dict: dict, path: str = PINYIN_LEXICON, digest: bytes | None = None) -> None:
+    """编译拼音词典并写入文件，文件头中记录源文件的哈希值"""
+    _write_file(path, compile_lexicon(pinyin_dict, digest or source_digest()))
+
+
+def _write_file(path: str, data: bytes) -> None:
+    """先写临时文件再替换，已被 mmap 打开的旧文件不受影响"""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_digest(path: str = PINYIN_LEXICON) -> bytes | None:
+    """
+    读取二进制词典文件头中的源文件哈希值。
+    Args:
+        path: 二进制词典路径
+    Returns:
+        哈希值，文件无法读取或格式、版本不符时返回 None
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+    magic, version, *_, digest = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        return None
+    return digest
+
+
+class PinyinLexicon:
+    """
+    只读的二进制拼音词典，查询结果与 pinyin_dict.get(hanzi, []) 的内容一致，但以元组表示。
+    每个读音序列只在第一次用到时解码为元组，之后所有读音相同的汉字共用这个元组。
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        magic, version, n_finals, n_chars, n_seqs, n_readings, digest = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('拼音词典文件格式不正确')
+        self.source_digest = digest
+        view = memoryview(buffer)
+        pos = HEADER.size
+        finals = [bytes(view[pos + i * FINAL_SIZE: pos + (i + 1) * FINAL_SIZE]).rstrip(b'\0').decode('ascii')
+                  for i in range(n_finals)]
+        pos += n_finals * FINAL_SIZE
+        self._codepoints = self._uint32_view(view[pos: pos + n_chars * 4])
+        pos += n_chars * 4
+        self._offsets = self._uint32_view(view[pos: pos + (n_seqs + 1) * 4])
+        pos += (n_seqs + 1) * 4
+        self._seq_ids = self._uint_view(view[pos: pos + n_chars * 2], 'H')
+        pos += n_chars * 2
+        self._readings = view[pos: pos + n_readings]
+        self._seq_objs = [None] * n_seqs
+        # 所有可能的读音字节对应的 (韵母, 声调)，查询时直接复用，不再新建对象
+        self._reading_objs = [(finals[code >> 1], code & 1) if code >> 1 < n_finals else None
+                              for code in range(256)]
+
+    @staticmethod
+    def _uint_view(view: memoryview, fmt: str):
+        if sys.byteorder == 'little':
+            return view.cast(fmt)
+        table = array(fmt, view.tobytes())  # 大端序机器上只能复制一份
+        table.byteswap()
+        return table
+
+    @classmethod
+    def _uint32_view(cls, view: memoryview):
+        return cls._uint_view(view, 'I')
+
+    def _seq(self, seq_id: int) -> tuple:
+        seq = self._seq_objs[seq_id]
+        if seq is None:
+            objs = self._reading_objs
+            codes = self._readings[self._offsets[seq_id]: self._offsets[seq_id + 1]]
+            seq = self._seq_objs[seq_id] = tuple(objs[code] for code in codes)
+        return seq
+
+    @classmethod
+    def open(cls, path: str = PINYIN_LEXICON) -> 'PinyinLexicon':
+        """以 mmap 方式打开二进制词典文件"""
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _index(self, hanzi: str) -> int:
+        if len(hanzi) != 1:
+            return -1
+        cp = ord(hanzi)
+        idx = bisect_left(self._codepoints, cp)
+        if idx < len(self._codepoints) and self._codepoints[idx] == cp:
+            return idx
+        return -1
+
+    def get(self, hanzi: str) -> tuple:
+        """
+        查询一个汉字的所有读音。
+        Args:
+            hanzi: 给定的汉字
+        Returns:
+            ((韵母, 声调), ...)，未收录的字返回空元组；读音相同的汉字返回同一个元组
+        """
+        idx = self._index(hanzi)
+        if idx < 0:
+            return ()
+        return self._seq(self._seq_ids[idx])
+
+    def __contains__(self, hanzi: str) -> bool:
+        return self._index(hanzi) >= 0
+
+    def __len__(self) -> int:
+        return len(self._codepoints)
+
+    def items(self):
+        """按码位顺序遍历 (汉字, 读音元组)"""
+        for cp, seq_id in zip(self._codepoints, self._seq_ids):
+            yield chr(cp), self._seq(seq_id)
+
+
+def load_lexicon(path: str = PINYIN_LEXICON) -> PinyinLexicon:
+    """
+    读取二进制拼音词典。文件不存在时从 hanzi_pinyin_class 现场编译（只在内存中，不写文件）。
+    文件格式过旧，或文件头中的哈希值与 hanzi_pinyin_class.py 不符时，发出警告，改用快照缓存目录中与源文件相符的编译结果，
+    没有时重新编译并存入该目录；缓存目录不可用或无法写入时只在内存中使用。源文件无法读取（如打包后的程序）时不做检查。
+    Args:
+        path: 二进制词典路径
+    Returns:
+        拼音词典
+    """
+    if not os.path.isfile(path):
+        from couyun.hanzi.hanzi_pinyin_class import pinyin_dict
+        return PinyinLexicon(compile_lexicon(pinyin_dict, source_digest()))
+    digest = source_digest()
+    if digest is None or read_digest(path) == digest:
+        return PinyinLexicon.open(path)
+    warnings.warn(f'{path} 与 {SOURCE_PATH} 不一致，已改用重新编译的结果；'
+                  f'运行 python -m couyun.hanzi.pinyin_lexicon 可更新该文件', stacklevel=2)
+    from couyun.common.snapshot import get_cache_dir
+    cache_dir = get_cache_dir()
+    cache_path = os.path.join(cache_dir, f'pinyin_lexicon-{digest.hex()}.bin') if cache_dir else None
+    if cache_path and read_digest(cache_path) == digest:
+        return PinyinLexicon.open(cache_path)
+    from couyun.hanzi.hanzi_pinyin_class import pinyin_dict
+    data = compile_lexicon(pinyin_dict, digest)
+    if cache_path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            _write_file(cache_path, data)
+            for file_name in os.listdir(cache_dir):  # 删除与旧源文件对应的编译结果
+                old_path = os.path.join(cache_dir, file_name)
+                if file_name.startswith('pinyin_lexicon-') and file_name.endswith('.bin') and old_path != cache_path:
+                    os.remove(old_path)
+        except OSError:
+            pass  # 缓存目录无法写入时只在内存中使用
+    return PinyinLexicon(data)
+
+
+if __name__ == '__main__':
+    from couyun.hanzi.hanzi_pinyin_class import pinyin_dict
+
+    write_lexicon(pinyin_dict)
+    print(f'已写入 {PINYIN_LEXICON}')
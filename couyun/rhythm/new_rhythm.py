@@ -2,7 +2,8 @@
 
 import math
 from couyun.common.num_to_cn import num_to_cn
-from couyun.hanzi.hanzi_pinyin_class import pinyin_dict
+from couyun.common.snapshot import load_snapshot
+from couyun.rhythm.registry import rhyme_books
 
 xin_yun = {1: ['a', 'ia', 'ua'], 2: ['o', 'e', 'uo'], 3: ['ie', 'ue', 've'], 4: ['ai', 'uai'],
            5: ['ei', 'uei', 'ui'], 6: ['ao', 'iao'], 7: ['ou', 'iu', 'iou'], 8: ['an', 'ian', 'uan', 'van'],
@@ -19,19 +20,45 @@ tong_hanzi = ['啊', '喔', '鹅', '衣', '乌', '迂', '哀', '欸', '熬', '
 xin_hanzi_trad = ['麻', '波', '皆', '開', '微', '豪', '尤', '寒', '文', '唐', '庚', '齊', '支', '姑']
 tong_hanzi_trad = ['啊', '喔', '鵝', '衣', '烏', '迂', '哀', '欸', '熬', '歐', '安', '恩', '昂', '英', '雍', '兒']
 
+_reverse_maps = {}
+_yun_tables = {}
 
-def get_new_yun(hanzi: str) -> list:
+
+def get_new_yun(hanzi: str) -> tuple:
     """
-    给定一个汉字，返回其所有韵母和声调的列表。
+    给定一个汉字，返回其所有韵母和声调的元组。
     Args:
         hanzi: 给定的汉字
     Returns:
-        该汉字所有读音的韵母和声调的列表
+        该汉字所有读音的 (韵母, 声调) 的元组
+    """
+    return rhyme_books.get(2).get(hanzi)
+
+
+def get_pinyin_lexicon():
+    """取得新韵、通韵共用的拼音词典，首次调用时载入"""
+    return rhyme_books.get(2)
+
+
+def final_to_category(rhyme_dict: dict) -> dict[str, int]:
     """
-    return pinyin_dict.get(hanzi, [])
+    将韵部韵母对照字典反转为韵母到韵部的字典，每个对照字典只反转一次。
+    Args:
+        rhyme_dict: 使用的新韵或通韵韵母韵部对照字典
+    Returns:
+        韵母到韵部编号的字典，韵母出现在多个韵部时取第一个
+    """
+    reverse = _reverse_maps.get(id(rhyme_dict))
+    if reverse is None:
+        reverse = {}
+        for category, rhymes in rhyme_dict.items():
+            for yun in rhymes:
+                reverse.setdefault(yun, category)
+        _reverse_maps[id(rhyme_dict)] = reverse
+    return reverse
 
 
-def convert_yun(yun_list: list, rhyme_dict: dict) -> list:
+def convert_yun(yun_list: list | tuple, rhyme_dict: dict) -> list:
     """
     将拼音韵转换为对应的新韵或通韵韵部。
     Args:
@@ -40,20 +67,40 @@ def convert_yun(yun_list: list, rhyme_dict: dict) -> list:
     Returns:
         韵部的列表
     """
+    reverse = final_to_category(rhyme_dict)
     converted_list = []
     for yun, pingze in yun_list:
-        # 遍历字典，找到韵母对应的类别
-        for category, rhymes in rhyme_dict.items():
-            if yun in rhymes:
-                if pingze == 0:
-                    converted_list.append(category)
-                else:
-                    converted_list.append(-category)
-                break
+        category = reverse.get(yun)
+        if category is not None:
+            converted_list.append(category if pingze == 0 else -category)
     return converted_list if converted_list else [107]
 
 
-def new_ping_ze(yun_list: list) -> str:
+def _build_yun_table(rhyme_dict: dict) -> dict[str, tuple]:
+    return {hanzi: tuple(convert_yun(yun_list, rhyme_dict)) for hanzi, yun_list in get_pinyin_lexicon().items()}
+
+
+def hanzi_new_yun(hanzi: str, rhyme_dict: dict) -> list:
+    """
+    给定一个汉字，返回其新韵或通韵韵部，与 convert_yun(get_new_yun(hanzi), rhyme_dict) 结果相同。
+    新韵、通韵的韵部列表对词典中所有汉字预先转换好，查询时只需一次字典读取。
+    Args:
+        hanzi: 给定的汉字
+        rhyme_dict: 使用的新韵或通韵韵母韵部对照字典
+    Returns:
+        韵部的列表，不在词典中的字为 [107]
+    """
+    book = 'xin' if rhyme_dict is xin_yun else 'tong' if rhyme_dict is tong_yun else None
+    if book is None:
+        return convert_yun(get_new_yun(hanzi), rhyme_dict)
+    table = _yun_tables.get(book)
+    if table is None:
+        table = _yun_tables[book] = load_snapshot(f'new_yun_{book}', lambda: _build_yun_table(rhyme_dict))
+    yun_list = table.get(hanzi)
+    return list(yun_list) if yun_list else [107]
+
+
+def new_ping_ze(yun_list: list | tuple) -> str:
     """
     根据新韵通韵返回平仄，或多音。
     Args:
@@ -83,7 +130,7 @@ def show_yun(hanzi: str | list, yun_rule: dict, yun_hanzi: list) -> str:
         汉字或列表对应的新韵、通韵韵部
     """
     if type(hanzi) is str:
-        hanzi_yun_list = convert_yun(get_new_yun(hanzi), yun_rule)
+        hanzi_yun_list = hanzi_new_yun(hanzi, yun_rule)
     else:
         hanzi_yun_list = hanzi
     if not hanzi_yun_list or hanzi_yun_list == [107]:
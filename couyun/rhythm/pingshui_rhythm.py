@@ -1,7 +1,8 @@
 """平水韵相关模块"""
 
+from couyun.common.memo import lru_memo
 from couyun.common.num_to_cn import num_to_cn  # 自用数字转换汉字代码
-import couyun.hanzi.hanzi_class as hanzi_class # 平水韵表
+from couyun.rhythm.registry import rhyme_books
 
 rhythm_name = [
     '东冬江支微鱼虞齐佳灰真文元寒删先萧肴豪歌麻阳庚青蒸尤侵覃盐咸',
@@ -22,6 +23,27 @@ rhythm_correspond = {1: 1, 2: 1, 3: 2, 4: 3, 5: 3, 6: 4, 7: 4, 8: 3, 9: [5, 10],
                      22: 2, 23: 11, 24: 11, 25: 11, 26: 12, 27: 13, 28: 14, 29: 14, 30: 14}
 
 
+def build_hanzi_index() -> dict[str, list[list]]:
+    """
+    遍历 hanzi_class 中的所有韵表，建立汉字到韵表的索引，由韵书登记表在第一次使用平水韵时调用。
+    Returns:
+        以单个字符为键，包含该字符的所有韵表列表为值的字典，韵表的顺序与 dir(hanzi_class) 一致
+    """
+    import couyun.hanzi.hanzi_class as hanzi_class  # 平水韵表
+    index = {}
+    for var_name in dir(hanzi_class):
+        var = getattr(hanzi_class, var_name)
+        if isinstance(var, list) and len(var) > 0 and isinstance(var[0], str):
+            for char in set(var[0]):
+                index.setdefault(char, []).append(var)
+    return index
+
+
+def get_hanzi_index() -> dict[str, list[list]]:
+    """取得汉字到平水韵表的索引，首次调用时载入"""
+    return rhyme_books.get(1)
+
+
 def traverse_lists_and_find(search_hanzi: str) -> list[list]:
     """
     查找并返回包含特定字符串的列表。
@@ -30,6 +52,9 @@ def traverse_lists_and_find(search_hanzi: str) -> list[list]:
     Returns:
         在 hanzi_class.py 中包含这一汉字的所有列表的列表
     """
+    if len(search_hanzi) == 1:
+        return list(rhyme_books.get(1).get(search_hanzi, ()))
+    import couyun.hanzi.hanzi_class as hanzi_class
     matching_list = []
     for var_name in dir(hanzi_class):
         var = getattr(hanzi_class, var_name)
@@ -39,6 +64,35 @@ def traverse_lists_and_find(search_hanzi: str) -> list[list]:
     return matching_list
 
 
+def _build_section_names(using_name: list[str]) -> dict[tuple[int, int], str]:
+    names = {}
+    for tone_idx, tone_names in enumerate(using_name):
+        for section in range(1, len(tone_names) + 1):
+            shown = section - 15 if tone_idx == 0 and section > 15 else section
+            names[(tone_idx + 1, section)] = f'平水韵{num_to_cn(shown)}{tone_names[section - 1]}'
+    return names
+
+
+def _build_cilin_names() -> dict[tuple[int, int], str]:
+    names = {}
+    for cilin in range(1, 20):
+        for tone, tone_name in ((1, '平'), (2, '仄'), (3, '仄'), (4, '入声')):
+            names[(cilin, tone)] = f'词林正韵{num_to_cn(cilin)}部{tone_name}'
+    return names
+
+
+# (声调, 韵部编号) 到平水韵部名的字典，如 (1, 16) -> '平水韵一先'
+pingshui_section_names = {False: _build_section_names(rhythm_name), True: _build_section_names(rhythm_name_trad)}
+# (词林韵部, 声调) 到词林韵部名的字典，如 (7, 1) -> '词林正韵七部平'
+cilin_section_names = _build_cilin_names()
+# 带符号的词林韵部编号到简短部名的字典，负数为仄声，15-19 部为入声，如 -7 -> '七部仄'
+cilin_part_names = {
+    is_trad: {num: f'{num_to_cn(abs(num))}部' + ('仄' if num < 0 else ('入聲' if is_trad else '入声') if num > 14 else '平')
+              for num in list(range(1, 20)) + list(range(-19, 0))}
+    for is_trad in (False, True)
+}
+
+
 def matching_list_to_rhythm_name(matching_list: list[list], is_trad: bool) -> list[str] | None:
     """
     将韵表列表转换为韵律名称。
@@ -49,27 +103,19 @@ def matching_list_to_rhythm_name(matching_list: list[list], is_trad: bool) -> li
         描述汉字所在韵部的列表
     """
     rhythm_name_list = []
+    section_names = pingshui_section_names[bool(is_trad)]
     for single_list in matching_list:
-        rh1 = abs(int(single_list[1])) - 1
-        rh2 = abs(int(single_list[2])) - 1
-        rh3_re = '平' if rh1 == 0 else ('仄' if rh1 in [1, 2] else '入声')
-        if rh2 == -1:
+        tone = abs(int(single_list[1]))
+        section = abs(int(single_list[2]))
+        if section == 0:
             return None
-        if rh3_re == '平' and rh2 + 1 > 15:
-            if is_trad:
-                pingshui_rh = f'平水韵{num_to_cn((rh2 + 1) - 15)}{rhythm_name_trad[rh1][int(abs(single_list[2])) - 1]}'
-            else:
-                pingshui_rh = f'平水韵{num_to_cn((rh2 + 1) - 15)}{rhythm_name[rh1][int(abs(single_list[2])) - 1]}'
-        else:
-            if is_trad:
-                pingshui_rh = f'平水韵{num_to_cn(rh2 + 1)}{rhythm_name_trad[rh1][int(abs(single_list[2])) - 1]}'
-            else:
-                pingshui_rh = f'平水韵{num_to_cn(rh2 + 1)}{rhythm_name[rh1][int(abs(single_list[2])) - 1]}'
-        rh3 = f'词林正韵{num_to_cn(abs(int(single_list[3])))}部{rh3_re}'
+        pingshui_rh = section_names[(tone, section)]
+        rh3 = cilin_section_names[(abs(int(single_list[3])), tone)]
         rhythm_name_list.append(pingshui_rh + '，' + rh3)
     return rhythm_name_list
 
 
+@lru_memo()
 def hanzi_rhythm(search_str: str, is_trad: bool, showit=False, only_ping_ze=False, ci_lin=False) -> bool | str | list:
     """
     根据汉字查找韵律信息。
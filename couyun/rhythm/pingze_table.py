@@ -0,0 +1,113 @@
+"""平仄表模块，按码位预先计算每部韵书的平仄代码，查询时只需一次数组读取。"""
+
+from array import array
+
+from couyun.common.snapshot import load_snapshot
+import couyun.rhythm.new_rhythm as nw
+from couyun.rhythm.pingshui_rhythm import get_hanzi_index, traverse_lists_and_find
+
+PINGZE_CODES = '0123'  # 多音字 0 平 1 仄 2 生僻字 3
+
+# 平仄表覆盖的码位区间（左闭右开）：〇、扩展 A 与基本区，扩展 B 及以后各区
+TABLE_RANGES = ((0x3000, 0xA000), (0x20000, 0x30000))
+
+_tables = {}
+_translations = {}
+
+
+def _pingshui_code(rh_lists: list[list]) -> int:
+    """根据平水韵表列表得到平仄代码，与 hanzi_rhythm(only_ping_ze=True) 一致"""
+    ping = any(rh_list[2] > 0 for rh_list in rh_lists)
+    ze = any(rh_list[2] < 0 for rh_list in rh_lists)
+    if not ping and not ze:
+        return 3
+    return 0 if ping and ze else 1 if ping else 2
+
+
+def _new_code(yun_list: list) -> int:
+    """根据拼音读音列表得到平仄代码，与 new_ping_ze 一致"""
+    return int(nw.new_ping_ze(yun_list))
+
+
+def _fill(source, to_code) -> list[array]:
+    """将 (汉字, 数据) 序列按码位填入各区间的平仄数组，未收录的字为生僻字 3"""
+    tables = [array('b', [3]) * (end - base) for base, end in TABLE_RANGES]
+    for hanzi, data in source:
+        cp = ord(hanzi)
+        for table, (base, end) in zip(tables, TABLE_RANGES):
+            if base <= cp < end:
+                table[cp - base] = to_code(data)
+                break
+    return tables
+
+
+def get_pingze_table(yun_shu: int) -> list[array]:
+    """
+    取得一部韵书的平仄表，首次使用时建立。新韵与通韵平仄相同，共用一张表。
+    Args:
+        yun_shu: 使用韵书的代码
+    Returns:
+        与 TABLE_RANGES 一一对应的平仄代码数组列表
+    """
+    key = 1 if yun_shu == 1 else 2
+    if key not in _tables:
+        if key == 1:
+            build = lambda: _fill(get_hanzi_index().items(), _pingshui_code)
+        else:
+            build = lambda: _fill(nw.get_pinyin_lexicon().items(), _new_code)
+        _tables[key] = load_snapshot(f'pingze_table_{key}', build,
+                                     encode=lambda tables: [table.tobytes() for table in tables],
+                                     decode=lambda data: [array('b', table) for table in data])
+    return _tables[key]
+
+
+def table_pingze(hanzi: str, yun_shu: int) -> str | None:
+    """
+    从平仄表中读取汉字的平仄代码。
+    Args:
+        hanzi: 单个汉字
+        yun_shu: 使用韵书的代码
+    Returns:
+        平仄代码，汉字不在平仄表覆盖的区间内时返回 None
+    """
+    cp = ord(hanzi)
+    for table, (base, end) in zip(get_pingze_table(yun_shu), TABLE_RANGES):
+        if base <= cp < end:
+            return PINGZE_CODES[table[cp - base]]
+    return None
+
+
+class PingzeTranslation(dict):
+    """
+    供 str.translate 使用的码位到平仄代码的映射。首次遇到某字时从平仄表读取并记住，
+    不在平仄表区间内的字按原有方法查询。
+    """
+
+    def __init__(self, yun_shu: int):
+        super().__init__()
+        self.yun_shu = yun_shu
+
+    def __missing__(self, cp: int) -> str:
+        hanzi = chr(cp)
+        ping_ze = table_pingze(hanzi, self.yun_shu)
+        if ping_ze is None:
+            if self.yun_shu == 1:
+                ping_ze = PINGZE_CODES[_pingshui_code(traverse_lists_and_find(hanzi))]
+            else:
+                ping_ze = nw.new_ping_ze(nw.get_new_yun(hanzi))
+        self[cp] = ping_ze
+        return ping_ze
+
+
+def get_pingze_translation(yun_shu: int) -> PingzeTranslation:
+    """
+    取得一部韵书的平仄转换表，新韵与通韵共用。
+    Args:
+        yun_shu: 使用韵书的代码
+    Returns:
+        可直接传给 str.translate 的平仄转换表
+    """
+    key = 1 if yun_shu == 1 else 2
+    if key not in _translations:
+        _translations[key] = PingzeTranslation(key)
+    return _translations[key]
@@ -0,0 +1,68 @@
+"""韵书登记模块。各韵书的数据在第一次用到该韵书时才载入，未使用的韵书不占用启动时间。"""
+
+import threading
+
+
+class RhymeBookRegistry:
+    """
+    韵书登记表，以韵书代码（1 平水 2 新韵 3 通韵）取得该韵书的数据。
+    多部韵书可以共用同一份数据（新韵与通韵共用拼音词典），共用时只载入一次。
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._keys = {}
+        self._books = {}
+        self._lock = threading.Lock()
+
+    def register(self, yun_shu: int, loader, key: str) -> None:
+        """
+        登记一部韵书。
+        Args:
+            yun_shu: 韵书代码
+            loader: 无参数的载入函数，返回该韵书的数据
+            key: 数据名，相同数据名的韵书共用一份数据
+        """
+        self._loaders[key] = loader
+        self._keys[yun_shu] = key
+
+    def get(self, yun_shu: int):
+        """取得韵书数据，首次调用时载入"""
+        key = self._keys[yun_shu]
+        book = self._books.get(key)
+        if book is None:
+            with self._lock:
+                book = self._books.get(key)
+                if book is None:
+                    book = self._books[key] = self._loaders[key]()
+        return book
+
+    def is_loaded(self, yun_shu: int) -> bool:
+        """韵书数据是否已经载入"""
+        return self._keys[yun_shu] in self._books
+
+    def preload(self, *yun_shus: int) -> None:
+        """
+        预先载入韵书数据，供需要预热的长期运行的服务使用。
+        Args:
+            yun_shus: 需要载入的韵书代码，不给则载入全部
+        """
+        for yun_shu in yun_shus or tuple(self._keys):
+            self.get(yun_shu)
+
+
+def _load_pingshui() -> dict:
+    from couyun.common.snapshot import load_snapshot
+    from couyun.rhythm.pingshui_rhythm import build_hanzi_index
+    return load_snapshot('pingshui_index', build_hanzi_index)
+
+
+def _load_pinyin():
+    from couyun.hanzi.pinyin_lexicon import load_lexicon
+    return load_lexicon()
+
+
+rhyme_books = RhymeBookRegistry()
+rhyme_books.register(1, _load_pingshui, 'pingshui')
+rhyme_books.register(2, _load_pinyin, 'pinyin')
+rhyme_books.register(3, _load_pinyin, 'pinyin')
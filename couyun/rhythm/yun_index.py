@@ -0,0 +1,83 @@
+"""
+韵部反查模块。由平水韵表与拼音词典一次性建立“韵部 -> 汉字”的反查索引，查询某一韵部的全部汉字只需一次字典读取。
+索引的键为 (韵部编号, 声调, 常用字范围)：
+    声调：0 不限；平水、词林为 1平 2上 3去 4入；新韵、通韵为 1平 2仄
+    常用字范围：0 不限；1 简体常用字（GB2312）；2 繁体常用字（Big5 常用字）
+"""
+
+from couyun.common.snapshot import load_snapshot
+import couyun.rhythm.new_rhythm as nw
+from couyun.rhythm.pingshui_rhythm import get_hanzi_index
+
+YUN_BOOKS = ('pingshui', 'cilin', 'xin', 'tong')
+
+_indexes = {}
+
+
+def common_scope(hanzi: str) -> tuple[bool, bool]:
+    """
+    判断一个汉字是否为简体、繁体常用字。
+    Args:
+        hanzi: 单个汉字
+    Returns:
+        是否在 GB2312 中，是否在 Big5 常用字（A440-C67E）中
+    """
+    try:
+        in_gb = len(hanzi.encode('gb2312')) == 2
+    except UnicodeEncodeError:
+        in_gb = False
+    try:
+        code = hanzi.encode('big5')
+        in_big5 = len(code) == 2 and 0xA440 <= int.from_bytes(code, 'big') <= 0xC67E
+    except UnicodeEncodeError:
+        in_big5 = False
+    return in_gb, in_big5
+
+
+def _yun_entries(book: str):
+    """遍历一部韵书中的 (汉字, 韵部编号, 声调)"""
+    if book in ('pingshui', 'cilin'):
+        for hanzi, rh_lists in get_hanzi_index().items():
+            for rh_list in rh_lists:
+                if book == 'pingshui':
+                    yield hanzi, rh_list[4], rh_list[1]
+                else:
+                    yield hanzi, abs(rh_list[3]), rh_list[1]
+    else:
+        rhyme_dict = nw.xin_yun if book == 'xin' else nw.tong_yun
+        for hanzi, yun_list in nw.get_pinyin_lexicon().items():
+            for yun in nw.convert_yun(yun_list, rhyme_dict):
+                if yun != 107:
+                    yield hanzi, abs(yun), 1 if yun > 0 else 2
+
+
+def _build_yun_index(book: str) -> dict[tuple[int, int, int], str]:
+    groups = {}
+    for hanzi, yun_num, tone in _yun_entries(book):
+        if hanzi == '\n':
+            continue
+        scopes = [0] + [scope for scope, ok in zip((1, 2), common_scope(hanzi)) if ok]
+        for scope in scopes:
+            for key in ((yun_num, 0, scope), (yun_num, tone, scope)):
+                groups.setdefault(key, set()).add(hanzi)
+    return {key: ''.join(sorted(hanzis)) for key, hanzis in groups.items()}
+
+
+def get_yun_index(book: str) -> dict[tuple[int, int, int], str]:
+    """
+    取得一部韵书的反查索引，首次调用时建立。
+    Args:
+        book: 'pingshui' 平水韵、'cilin' 词林正韵、'xin' 中华新韵、'tong' 中华通韵
+    Returns:
+        (韵部编号, 声调, 常用字范围) 到汉字串的字典
+    """
+    if book not in _indexes:
+        _indexes[book] = load_snapshot(f'yun_index_{book}', lambda: _build_yun_index(book))
+    return _indexes[book]
+
+
+def yun_book_name(yun_shu: int, ci_lin: bool = False) -> str:
+    """韵书代码转换为反查索引使用的韵书名"""
+    if yun_shu == 1:
+        return 'cilin' if ci_lin else 'pingshui'
+    return 'xin' if yun_shu == 2 else 'tong'
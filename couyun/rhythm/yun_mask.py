@@ -0,0 +1,165 @@
+"""
+韵部位掩码模块。每个汉字所属的韵部预先表示为整数位掩码，判断同韵、邻韵以及统计最多的韵部时只需位运算。
+    平水韵：总编号 1-106 对应第 0-105 位
+    词林正韵、新韵、通韵：韵部编号带符号，正数 n 对应第 n - 1 位，负数 -n 对应第 SIGNED_SHIFT + n - 1 位，
+    表示未知韵部的 107 对应第 SIGNED_SHIFT - 1 位
+一个字的同一韵部可能出现多次（新韵、通韵中多个读音的韵母相同），此时以多层掩码表示，
+第 k 层为出现至少 k 次的韵部，这样计数时与逐个统计列表元素的结果一致。
+"""
+
+from couyun.common.snapshot import load_snapshot
+import couyun.rhythm.new_rhythm as nw
+from couyun.rhythm.pingshui_rhythm import get_hanzi_index, rhythm_correspond
+
+SIGNED_SHIFT = 32
+LOW_MASK = (1 << SIGNED_SHIFT) - 1
+
+_tables = {}
+
+
+def yun_to_bit(yun: int, signed: bool) -> int:
+    """单个韵部编号转换为位掩码"""
+    if signed and abs(yun) == 107:
+        return 1 << (SIGNED_SHIFT - 1 if yun > 0 else 2 * SIGNED_SHIFT - 1)
+    if signed and yun < 0:
+        return 1 << (SIGNED_SHIFT - yun - 1)
+    return 1 << (yun - 1)
+
+
+def yun_list_to_masks(yun_list: list[int], signed: bool, skip_unknown: bool = True) -> tuple[int, ...]:
+    """
+    韵部列表转换为多层位掩码。
+    Args:
+        yun_list: 韵部编号列表，可以有重复
+        signed: 韵部编号是否带符号
+        skip_unknown: 是否忽略表示未知韵部的 107
+    Returns:
+        多层位掩码，第 k 层为出现至少 k + 1 次的韵部；没有韵部时为空元组
+    """
+    masks = []
+    for yun in yun_list:
+        if yun == 107 and skip_unknown:
+            continue
+        bit = yun_to_bit(yun, signed)
+        for i, mask in enumerate(masks):
+            if not mask & bit:
+                masks[i] = mask | bit
+                break
+        else:
+            masks.append(bit)
+    return tuple(masks)
+
+
+def mask_to_yun_list(mask: int, signed: bool) -> list[int]:
+    """位掩码转换为韵部编号列表，按位从低到高排列"""
+    yun_list = []
+    while mask:
+        low = mask & -mask
+        pos = low.bit_length()
+        if signed and pos % SIGNED_SHIFT == 0:
+            yun_list.append(107 if pos == SIGNED_SHIFT else -107)
+        elif signed and pos > SIGNED_SHIFT:
+            yun_list.append(SIGNED_SHIFT - pos)
+        else:
+            yun_list.append(pos)
+        mask ^= low
+    return yun_list
+
+
+def flip_tone(mask: int) -> int:
+    """带符号的位掩码取反，即所有韵部编号取相反数"""
+    return (mask & LOW_MASK) << SIGNED_SHIFT | mask >> SIGNED_SHIFT
+
+
+def first_in_mask(nested_list: list[list[int]], mask: int, signed: bool) -> int | None:
+    """按列表中出现的先后，返回第一个在位掩码中的韵部编号"""
+    for sublist in nested_list:
+        for yun in sublist:
+            if yun_to_bit(yun, signed) & mask:
+                return yun
+    return None
+
+
+class MaskCounter:
+    """
+    以按位分层的计数器同时统计所有韵部出现的次数：第 i 层记录各韵部计数的第 i 个二进制位，
+    加入一个掩码即做一次逐层的二进制加法。
+    """
+
+    def __init__(self):
+        self.planes = []
+        self.union = 0
+
+    def add(self, mask: int) -> None:
+        self.union |= mask
+        carry = mask
+        for i, plane in enumerate(self.planes):
+            if not carry:
+                return
+            self.planes[i] = plane ^ carry
+            carry &= plane
+        if carry:
+            self.planes.append(carry)
+
+    def add_masks(self, masks: tuple[int, ...]) -> None:
+        for mask in masks:
+            self.add(mask)
+
+    def max_mask(self) -> int:
+        """出现次数最多的所有韵部的位掩码，没有任何韵部时为 0"""
+        best = self.union
+        for plane in reversed(self.planes):
+            if best & plane:
+                best &= plane
+        return best
+
+
+def _build_mask_table(book: str) -> dict[str, tuple[int, ...]]:
+    table = {}
+    if book in ('pingshui', 'cilin'):
+        for hanzi, rh_lists in get_hanzi_index().items():
+            if book == 'pingshui':
+                masks = yun_list_to_masks(list(set(rh_list[4] for rh_list in rh_lists)), False)
+            else:
+                masks = yun_list_to_masks(list(set(rh_list[3] for rh_list in rh_lists)), True)
+            if masks:
+                table[hanzi] = masks
+    else:
+        rhyme_dict = nw.xin_yun if book == 'xin' else nw.tong_yun
+        for hanzi, yun_list in nw.get_pinyin_lexicon().items():
+            masks = yun_list_to_masks(nw.convert_yun(yun_list, rhyme_dict), True)
+            if masks:
+                table[hanzi] = masks
+    return table
+
+
+def get_yun_masks(hanzi: str, yun_shu: int, ci_lin: bool = False) -> tuple[int, ...]:
+    """
+    取得一个汉字的多层韵部位掩码，与 hanzi_to_yun 的结果对应。
+    Args:
+        hanzi: 一个汉字
+        yun_shu: 使用韵书的代码
+        ci_lin: 是否使用词林正韵
+    Returns:
+        多层位掩码，不在韵书中的字为空元组
+    """
+    if yun_shu == 1:
+        book = 'cilin' if ci_lin else 'pingshui'
+    else:
+        book = 'xin' if yun_shu == 2 else 'tong'
+    if book not in _tables:
+        _tables[book] = load_snapshot(f'yun_mask_{book}', lambda: _build_mask_table(book))
+    return _tables[book].get(hanzi, ())
+
+
+def _correspond_mask(pingshui_num: int) -> int:
+    cilin = rhythm_correspond[pingshui_num]
+    cilin = [cilin] if isinstance(cilin, int) else cilin
+    mask = 0
+    for num in cilin:
+        mask |= 1 << (num - 1)
+    return mask
+
+
+# 平水韵平声韵部（1-30）对应的词林正韵韵部位掩码，用于判断首句邻韵
+correspond_masks = {num: _correspond_mask(num) for num in rhythm_correspond}
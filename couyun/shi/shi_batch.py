@@ -0,0 +1,118 @@
+"""
+批量诗歌校验模块。以进程池并行校验大量诗歌，各工作进程启动时载入一次韵表（拼音词典以 mmap 方式共享，
+索引读取快照），诗歌分块发送以减少进程间通信，结果可按输入顺序或完成顺序逐个返回。
+"""
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+from couyun.common.common import hanzi_to_pingze, hanzi_to_yun
+from couyun.common.formatters import format_result, result_to_dict
+from couyun.common.snapshot import get_cache_dir, set_cache_dir
+from couyun.common.text_proceed import process_text
+from couyun.shi.shi_forms import LYU_SHI, VerseForm
+from couyun.shi.shi_rhythm import LENGTH_ERROR, ShiRhythm, is_valid_length
+
+DEFAULT_CHUNKSIZE = 64
+
+
+def _warm_up(yun_shu: int, is_trad: bool) -> None:
+    """查询一个字，使拼音词典、平仄表、韵部掩码等在本进程中载入"""
+    hanzi_to_pingze('东', yun_shu, is_trad)
+    hanzi_to_yun('东', yun_shu, is_trad)
+
+
+def _init_worker(cache_dir: str | None, yun_shu: int, is_trad: bool) -> None:
+    set_cache_dir(cache_dir)
+    _warm_up(yun_shu, is_trad)
+
+
+def check_poem(text: str, yun_shu: int = 1, is_trad: bool = False, fmt: str = 'text',
+               forms: tuple[VerseForm, ...] = LYU_SHI):
+    """
+    校验一首诗。
+    Args:
+        text: 输入的诗，可以带标点
+        yun_shu: 使用韵书的代码
+        is_trad: 簡體 or 繁體
+        fmt: 输出格式，'text'、'json'、'html' 或 'dict'（result_to_dict 的字典）
+        forms: 校验的诗体，见 couyun.shi.shi_forms
+    Returns:
+        指定格式的结果；失败时为错误码，LENGTH_ERROR 表示字数不正确，其余同 ShiRhythm.main_shi
+    """
+    processed, comma_pos = process_text(text)
+    if not is_valid_length(len(processed), forms):
+        result = LENGTH_ERROR
+    else:
+        result = ShiRhythm(yun_shu, processed, comma_pos, is_trad, forms=forms).check()
+    if fmt == 'dict':
+        return result_to_dict(result)
+    return format_result(result, fmt)
+
+
+def _check_chunk(chunk: list[tuple[int, str]], yun_shu: int, is_trad: bool, fmt: str,
+                 forms: tuple[VerseForm, ...]) -> list[tuple[int, object]]:
+    return [(index, check_poem(text, yun_shu, is_trad, fmt, forms)) for index, text in chunk]
+
+
+def _chunks(poems, chunksize: int):
+    numbered = enumerate(poems)
+    while True:
+        chunk = list(islice(numbered, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def check_poems(poems, yun_shu: int = 1, is_trad: bool = False, workers: int = None, fmt: str = 'text',
+                ordered: bool = True, chunksize: int = DEFAULT_CHUNKSIZE, forms: tuple[VerseForm, ...] = LYU_SHI):
+    """
+    批量校验诗歌，结果逐个返回。输入可以是很大的可迭代对象，同时在处理中的只有有限的几块。
+    Args:
+        poems: 诗歌文本的可迭代对象
+        yun_shu: 使用韵书的代码
+        is_trad: 簡體 or 繁體
+        workers: 工作进程数，默认为 CPU 数；为 0 或 1 时在当前进程中逐首校验
+        fmt: 输出格式，见 check_poem
+        ordered: True 按输入顺序返回，False 按完成顺序返回
+        chunksize: 每次发送给工作进程的诗歌数
+        forms: 校验的诗体，见 couyun.shi.shi_forms
+    Yields:
+        (诗歌在输入中的序号, 该诗的结果)
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for index, text in enumerate(poems):
+            yield index, check_poem(text, yun_shu, is_trad, fmt, forms)
+        return
+
+    _warm_up(yun_shu, is_trad)  # 先在主进程中建立快照，工作进程直接读取
+    max_pending = workers * 2
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(get_cache_dir(), yun_shu, is_trad)) as executor:
+        chunks = _chunks(poems, chunksize)
+        pending = set()
+        done_results = {}  # 按输入顺序返回时，暂存先完成的结果
+        next_index = 0
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                else:
+                    pending.add(executor.submit(_check_chunk, chunk, yun_shu, is_trad, fmt, forms))
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                for index, result in future.result():
+                    if ordered:
+                        done_results[index] = result
+                    else:
+                        yield index, result
+            while next_index in done_results:
+                yield next_index, done_results.pop(next_index)
+                next_index += 1
@@ -1,144 +1,84 @@
 """判断诗歌首句格式的模块，由于相对比较复杂，需要考虑多音字、拗救以及诗歌中可能的错误，单独设置。"""
-from couyun.common.common import hanzi_to_pingze
+from couyun.common.poem_analysis import PoemAnalysis
+from couyun.shi.shi_forms import RHYME_RULES, TOGGLE, VerseForm
 
 
 class ShiFirst:
-    def __init__(self, poem, yun_shu, first_yayun, poem_pingze, set_len, is_trad):
+    def __init__(self, poem, yun_shu, first_yayun, poem_pingze, form: VerseForm, is_trad, analysis=None):
         self.poem = poem
+        self.analysis = analysis or PoemAnalysis(poem, yun_shu, is_trad)  # 可与 ShiRhythm 共用逐字分析结果
         self.yun_shu = yun_shu
         self.first_yayun = first_yayun
         self.poem_pingze = poem_pingze
-        self.set_len = set_len
+        self.form = form
         self.is_trad = is_trad
+        self.decided_line = 0  # 首句格式由第几句确定，之后的句子不影响结果
 
-    @staticmethod
-    def _match_combinations(poem_str: str) -> list[str]:
+    def _sen_to_poem_str(self, sen_pattern: str) -> str:
         """
-        将一个五言句中二四五字对应平仄代号转换为可能的组合结果。
+        给定一句诗的平仄代码串，返回诗体指定的三个字（五言为二四五字）对应平仄代号的字符串
         Args:
-            poem_str: 二四五字对应平仄代号的字符串，0中 1平 2仄
+            sen_pattern: 诗歌某一句的平仄代码串
         Returns:
-            匹配的可能的组合结果
+            三个字对应平仄代号的字符串
         """
-        combinations = ["111", "112", "121", "122", "211", "212", "221", "222"]
-        matched_combinations = []
-        for combo in combinations:
-            match = True
-            for i in range(3):
-                if poem_str[i] != '0' and poem_str[i] != combo[i]:
-                    match = False
-                    break
-            if match:
-                matched_combinations.append(combo)
-        return matched_combinations
+        return ''.join(sen_pattern[pos] for pos in self.form.key_positions)
 
-    def _sen_to_poem_str(self, poem_sen: str) -> str:
+    def _first_poem(self, poem_strs: list[str]) -> int:
         """
-        给定一句诗的内容，返回二四五字对应平仄代号的字符串
+        逐句计算，直到某一句匹配到特定的格式，得到首句的格式。诗再长也只循环一遍，不递归。
+        关键字对应的格式由诗体的律句格式推出；各句应有的格式按诗体平韵的轮换规则推出，仄韵诗也是如此，
+        与校验时所用的仄韵轮换规则不同，沿用原有的推断结果。
         Args:
-            poem_sen: 诗歌某一句的内容
+            poem_strs: 每一句关键字对应平仄代号的字符串
         Returns:
-            二四五字对应平仄代号的字符串
+            句子匹配的规则代码
         """
-        hanzi1 = hanzi_to_pingze(poem_sen[1], self.yun_shu, self.is_trad)
-        hanzi3 = hanzi_to_pingze(poem_sen[3], self.yun_shu, self.is_trad)
-        hanzi5 = hanzi_to_pingze(poem_sen[-1], self.yun_shu, self.is_trad)
-        return hanzi1 + hanzi3 + hanzi5
-
-    @staticmethod
-    def _get_current_pattern(sen: int, ping_ze: str) -> list[int]:
-        """
-        如果首句押韵，给定当前的句数，返回应该的当句格式代号列表。比如如果此时是第一句，且全诗押平声韵，那么句式格式一定是1或3
-        Args:
-            sen: 当前的诗句数
-            ping_ze: 诗歌的平仄
-        Returns:
-            二四五字对应平仄代号的字符串
-        """
-        ping_initial = [[1, 3], [3, 1], [4, 2], [1, 3]]
-        ping_cycle = [[2, 4], [3, 1], [4, 2], [1, 3]]
-        ze_initial = [[2, 4], [4, 2], [1, 3], [2, 4]]
-        ze_cycle = [[3, 1], [4, 2], [1, 3], [2, 4]]
-
-        if ping_ze == "ping":
-            current = ping_initial[sen] if sen <= 3 else ping_cycle[sen % 4]
+        form = self.form
+        turn = form.turn[1]
+        if self.first_yayun:
+            first_pattern = list(RHYME_RULES[1 if self.first_yayun == 1 else -1])
+            current_pattern = first_pattern
         else:
-            current = ze_initial[sen] if sen <= 3 else ze_cycle[sen % 4]
-        return current
-
-    def _first_poem(self, matched_lists: list[list[str]], sen_num: int, match_time=0) -> int:
-        """
-        递归计算每一个句子，直到其匹配到特定的格式，得到首句的格式。
-        Args:
-            matched_lists: 每一句匹配到的可能的组合结果的列表
-            sen_num: 诗的句数
-            match_time:匹配次数，上限为诗的句数
-        Returns:
-            句子匹配的规则代码（五言，七言需要在此基础上 +4）
-        """
-        matched_list = matched_lists[match_time]
-        rule = {'111': 0, '112': 2, '121': 1, '122': 2, "211": 3, '212': 4, '221': 0, '222': 4}
-        changed_set = set([rule[i] for i in matched_list])
-        if self.first_yayun == 1:
-            intersection = changed_set.intersection(set(self._get_current_pattern(match_time, 'ping')))
-            if len(intersection) == 1:
-                current = next(iter(intersection))
-                place = self._get_current_pattern(match_time, 'ping').index(current)
-                return self._get_current_pattern(0, 'ping')[place]
-        elif self.first_yayun == -1:
-            intersection = changed_set.intersection(set(self._get_current_pattern(match_time, 'ze')))
-            if len(intersection) == 1:
-                current = next(iter(intersection))
-                place = self._get_current_pattern(match_time, 'ze').index(current)
-                return self._get_current_pattern(0, 'ze')[place]
-        else:
-            if len(changed_set) == 1 and changed_set != {0}:  # 1.4.6还能在这遇到 BUG，真得骂自己！！！！！
-                result = next(iter(changed_set)) - match_time
-                while result <= 0:
-                    result += 4
+            undo_turn = {after: before for before, after in turn.items()}
+        for match_time, poem_str in enumerate(poem_strs):
+            self.decided_line = match_time
+            changed_set = form.matched_rules[poem_str]
+            if self.first_yayun:
+                if match_time:
+                    current_pattern = [form.next_rule(rule, match_time - 1, self.first_yayun, 1)
+                                       for rule in current_pattern]
+                intersection = changed_set.intersection(current_pattern)
+                if len(intersection) == 1:
+                    place = current_pattern.index(next(iter(intersection)))
+                    return first_pattern[place]
+            elif len(changed_set) == 1 and changed_set != {0}:  # 1.4.6还能在这遇到 BUG，真得骂自己！！！！！
+                result = next(iter(changed_set))
+                for _ in range(match_time):  # 按轮换规则倒推回首句
+                    result = undo_turn[result]
                 return result
-        if sen_num == match_time + 1:
-            if not matched_list:
-                return 1 if self.poem_pingze == 1 else 2
-            co_rule = rule[matched_list[0]]
-            if co_rule == 0:
-                if matched_list[0] == '111' and self.poem_pingze > 0:
-                    co_rule = 1
-                elif matched_list[0] == '221' and self.poem_pingze > 0:
-                    co_rule = 3
-                elif matched_list[0] == '111' and self.poem_pingze < 0:
-                    co_rule = 2
-                else:
-                    co_rule = 4
-            if co_rule in [2, 4] and self.poem_pingze > 0:
-                co_rule -= 1
-            if co_rule in [1, 3] and self.poem_pingze < 0:
-                co_rule += 1
-            return co_rule if self.first_yayun else (co_rule + 1) % 4
-        match_time += 1
-        return self._first_poem(matched_lists, sen_num, match_time)
+
+        # 没有一句能确定格式，按最后一句推断：末句为押韵句，首句押韵时与之同式，不押韵时为其下一式
+        matched_list = form.matched_combinations[poem_strs[-1]]
+        if not matched_list:
+            return 1 if self.poem_pingze == 1 else 2
+        co_rule = form.combination_rule[matched_list[0]] or form.nearest_rule[matched_list[0]]
+        if co_rule not in RHYME_RULES[1 if self.poem_pingze == 1 else -1]:
+            co_rule = TOGGLE[co_rule]
+        return co_rule if self.first_yayun else turn[co_rule]
 
     def _seperate_poem(self) -> tuple[list[str], int]:
         """
-        将诗歌切分为数个句子。
+        将诗歌的平仄代码串按诗体的句长切分为数个句子。
         Returns:
             返回两个值：
-                拆分的句子列表
+                拆分的句子平仄代码串列表
                 句数
         """
-        proceed_poem = self.poem
-        poem_str_list = []
-        sen_num = 0
-        while len(proceed_poem) > 0:
-            if len(proceed_poem) % 7 == 0 and self.set_len != 5:
-                poem_str_list.append(proceed_poem[2:7])
-                proceed_poem = proceed_poem[7:]
-                sen_num += 1
-            else:
-                poem_str_list.append(proceed_poem[0:5])
-                proceed_poem = proceed_poem[5:]
-                sen_num += 1
-        return poem_str_list, sen_num
+        proceed_poem = self.analysis.pingze
+        sen_len = self.form.sen_len
+        poem_str_list = [proceed_poem[pos: pos + sen_len] for pos in range(0, len(proceed_poem), sen_len)]
+        return poem_str_list, len(poem_str_list)
 
     def main_first(self) -> int:
         """
@@ -146,11 +86,5 @@ class ShiFirst:
         Returns:
             句子匹配的对应规则代码
         """
-        poem_lists, sentence_num = self._seperate_poem()
-        num_lists = []
-        for sentence in poem_lists:
-            check_poem_str = self._sen_to_poem_str(sentence)
-            poem_list = self._match_combinations(check_poem_str)
-            num_lists.append(poem_list)
-        matched_method = self._first_poem(num_lists, sentence_num)
-        return matched_method if self.set_len == 5 else matched_method + 4
+        poem_lists, _ = self._seperate_poem()
+        return self._first_poem([self._sen_to_poem_str(sentence) for sentence in poem_lists])
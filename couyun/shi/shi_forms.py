@@ -0,0 +1,240 @@
+"""
+诗体格律数据模块。每种诗体只以数据描述：句长、四种句式的律句格式（平韵、仄韵各一套）、拗句与救句、句式的轮换规则、
+押韵位置与句数限制，载入时编译为位掩码表，由 ShiRhythm 通用地校验。增加一种诗体只需在此增加一项数据。
+"""
+from itertools import product
+
+# 句式代码：1 平起押韵 2 平起不押韵 3 仄起押韵 4 仄起不押韵（七言按后五字论）
+# 平韵时下一句的句式
+TURN = {1: 2, 2: 3, 3: 4, 4: 1}
+# 首句押韵时第二句的句式
+FIRST_TURN = {1: 3, 2: 4, 3: 1, 4: 2}
+# 仄韵时下一句的句式
+ZE_TURN = {1: 4, 2: 1, 3: 2, 4: 3}
+# 押韵与不押韵的同一句式互换，用于修正首句
+TOGGLE = {1: 2, 2: 1, 3: 4, 4: 3}
+# 平韵、仄韵时押韵句的句式
+RHYME_RULES = {1: (1, 3), -1: (2, 4)}
+
+
+def compile_lyu_ju(pattern: str) -> tuple[str, int, int, int]:
+    """
+    将律句格式编译为位掩码，第 i 位对应句中第 i 个字。
+    Args:
+        pattern: 律句格式，0中 1平 2仄
+    Returns:
+        格式本身，须为平的位掩码，须为仄的位掩码，格式长度
+    """
+    ping_mask = ze_mask = 0
+    for i, p_char in enumerate(pattern):
+        if p_char == '1':
+            ping_mask |= 1 << i
+        elif p_char == '2':
+            ze_mask |= 1 << i
+    return pattern, ping_mask, ze_mask, len(pattern)
+
+
+class VerseForm:
+    """一种诗体的格律数据及其编译结果"""
+
+    def __init__(self, name: str, sen_len: int, rules: dict[int, list[str]], ze_rules: dict[int, list[str]] = None,
+                 ao: dict[str, int] = None, rescue: dict[int, list[str]] = None, key_positions: tuple = None,
+                 probe: int | None = -3, min_lines: int = 4, max_lines: int = None, rhyme_step: int = 2,
+                 kind: tuple[str, str] = None, turn: dict = TURN, first_turn: dict = FIRST_TURN,
+                 ze_turn: dict = ZE_TURN, ze_first_turn: dict = FIRST_TURN):
+        """
+        Args:
+            name: 诗体名
+            sen_len: 句长
+            rules: 平韵时四种句式各自的律句格式，0中 1平 2仄，拗句须放在后面
+            ze_rules: 仄韵时与平韵不同的句式的律句格式
+            ao: 拗句格式到拗句代码的字典，1 本句自救 2 对句相救
+            rescue: 上一句为对句相救的拗句时，本句可用的律句格式
+            key_positions: 推断首句格式时所看的三个字的位置（从 0 开始），默认为末五字的第二、四、五字
+            probe: 首句末字为多音字、生僻字时，用来判断首句是否押韵的字的位置，None 表示不判断
+            min_lines: 最少句数
+            max_lines: 最多句数，None 表示不限
+            rhyme_step: 每几句一押韵，句数须为其倍数
+            kind: 诗体称谓（简体, 繁體），None 表示按句数称绝句、律诗、排律
+            turn: 平韵时下一句的句式
+            first_turn: 平韵且首句押韵时第二句的句式
+            ze_turn: 仄韵时下一句的句式
+            ze_first_turn: 仄韵且首句押韵时第二句的句式
+        """
+        self.name = name
+        self.sen_len = sen_len
+        self.key_positions = key_positions or (sen_len - 4, sen_len - 2, sen_len - 1)
+        self.probe = probe
+        self.min_lines = min_lines
+        self.max_lines = max_lines
+        self.rhyme_step = rhyme_step
+        self.kind = kind
+        self.turn = {1: turn, -1: ze_turn}
+        self.first_turn = {1: first_turn, -1: ze_first_turn}
+        self.ao = ao or {}
+        for patterns in [*rules.values(), *(ze_rules or {}).values(), *(rescue or {}).values()]:
+            for pattern in patterns:
+                if len(pattern) != sen_len:
+                    raise ValueError(f'{name}的律句格式长度与句长不符: {pattern}')
+        # 平韵、仄韵两套律句格式只编译一次
+        self.compiled = {
+            pingze: {rule: [compile_lyu_ju(pattern) for pattern in patterns] for rule, patterns in rule_dict.items()}
+            for pingze, rule_dict in ((1, rules), (-1, {**rules, **(ze_rules or {})}))
+        }
+        self.rescue = {rule: [compile_lyu_ju(pattern) for pattern in patterns]
+                       for rule, patterns in (rescue or {}).items()}
+        self._build_key_tables()
+
+    def _build_key_tables(self) -> None:
+        """
+        由律句格式得到推断首句格式用的表：关键字平仄组合对应的句式，以及含多音字、生僻字的平仄代码可能的组合。
+        """
+        rule_keys = {rule: {''.join(compiled[0][pos] for pos in self.key_positions) for compiled in patterns}
+                     for rule, patterns in self.compiled[1].items()}
+
+        def fits(key: str, combo: str) -> bool:
+            return all(k_char == '0' or k_char == c_char for k_char, c_char in zip(key, combo))
+
+        # 关键字的所有平仄组合，及其能区分出的句式，0 表示无法区分
+        self.combinations = [''.join(combo) for combo in product('12', repeat=len(self.key_positions))]
+        self.combination_rule = {}
+        # 无法区分时，取关键字第一字（平起、仄起）相同的句式
+        self.nearest_rule = {}
+        for combo in self.combinations:
+            rules = [rule for rule, keys in rule_keys.items() if any(fits(key, combo) for key in keys)]
+            self.combination_rule[combo] = rules[0] if len(rules) == 1 else 0
+            same_start = [rule for rule, keys in rule_keys.items() if any(fits(key[0], combo[0]) for key in keys)]
+            self.nearest_rule[combo] = min(same_start, default=1)
+        # 关键字的平仄代码（含多音字 0 与生僻字 3）可能对应的组合与句式
+        self.matched_combinations = {
+            ''.join(codes): [combo for combo in self.combinations
+                             if all(p_char == '0' or p_char == c_char for p_char, c_char in zip(codes, combo))]
+            for codes in product('0123', repeat=len(self.key_positions))
+        }
+        self.matched_rules = {codes: frozenset(self.combination_rule[combo] for combo in combos)
+                              for codes, combos in self.matched_combinations.items()}
+
+    def next_rule(self, rule: int, line: int, first_yayun: int, poem_pingze: int) -> int:
+        """
+        第 line 句（从 0 开始）之后一句的句式。
+        Args:
+            rule: 第 line 句的句式
+            line: 句子序号
+            first_yayun: 首句是否押韵，-1押仄韵 1押平韵 0不押韵
+            poem_pingze: 诗的平仄代码
+        """
+        pingze = 1 if poem_pingze == 1 else -1
+        if first_yayun and line == 0:  # 若首句押韵
+            return self.first_turn[pingze][rule]
+        return self.turn[pingze][rule]
+
+    def rule_sequence(self, first_rule: int, how_many: int, first_yayun: int, poem_pingze: int) -> list[int]:
+        """
+        由首句句式按轮换规则得到各句的句式。
+        Args:
+            first_rule: 首句的句式
+            how_many: 诗的句数
+            first_yayun: 首句是否押韵，-1押仄韵 1押平韵 0不押韵
+            poem_pingze: 诗的平仄代码
+        Returns:
+            每个句子的句式列表
+        """
+        rules = [first_rule]
+        for line in range(how_many - 1):
+            rules.append(self.next_rule(rules[-1], line, first_yayun, poem_pingze))
+        return rules
+
+    def fits_lines(self, lines: int) -> bool:
+        """句数是否符合该诗体"""
+        return (lines >= self.min_lines and lines % self.rhyme_step == 0
+                and (self.max_lines is None or lines <= self.max_lines))
+
+    def fits(self, length: int) -> bool:
+        """字数能否构成该诗体"""
+        return length % self.sen_len == 0 and self.fits_lines(length // self.sen_len)
+
+    def matches_commas(self, comma_pos: list[int]) -> bool:
+        """标点位置是否恰为该诗体每句之末"""
+        return (self.fits_lines(len(comma_pos))
+                and all(pos == self.sen_len * i + self.sen_len - 1 for i, pos in enumerate(comma_pos)))
+
+    def patterns(self, rule: int, poem_pingze: int, ao: int = 0) -> list[tuple[str, int, int, int]]:
+        """
+        一种句式编译后的律句格式。
+        Args:
+            rule: 句式代码
+            poem_pingze: 诗的平仄代码
+            ao: 上一句的拗句代码
+        Returns:
+            编译后的律句格式列表
+        """
+        if ao == 2 and rule in self.rescue:
+            return self.rescue[rule]
+        return self.compiled[-1 if poem_pingze == -1 else 1][rule]
+
+    def kind_name(self, is_trad: bool) -> str | None:
+        """诗体称谓，None 表示按句数称呼"""
+        if self.kind is None:
+            return None
+        return self.kind[1] if is_trad else self.kind[0]
+
+
+WU_YAN = VerseForm(
+    '五言', 5,
+    rules={
+        1: ['11221', '21121', '11121'],  # 平起押韵
+        2: ['01122', '11212'],  # 平起不押韵
+        3: ['02211'],  # 仄起押韵
+        4: ['02012', '02022'],  # 仄起不押韵（含拗句）
+    },
+    ze_rules={
+        1: ['11221', '21121', '11121', '21221'],  # 仄韵无孤平
+        4: ['02012'],  # 仄韵无“中仄中仄仄”拗句，因为没法对句救
+    },
+    ao={'11212': 1, '02022': 2},
+    rescue={1: ['21121', '11121']},
+)
+
+QI_YAN = VerseForm(
+    '七言', 7,
+    rules={
+        1: ['0211221', '0221121', '0211121'],  # 仄起押韵
+        2: ['0201122', '0211212'],  # 仄起不押韵
+        3: ['0102211'],  # 平起押韵
+        4: ['0102012', '0102022'],  # 平起不押韵（含拗句）
+    },
+    ze_rules={4: ['0102012']},
+    ao={'0211212': 1, '0102022': 2},
+    rescue={1: ['0221121', '0211121']},
+)
+
+LIU_YAN = VerseForm(
+    '六言', 6,
+    rules={
+        1: ['010201'],  # 平起押韵
+        2: ['010202'],  # 平起不押韵
+        3: ['020101'],  # 仄起押韵
+        4: ['020102'],  # 仄起不押韵
+    },
+    key_positions=(1, 3, 5),
+    probe=None,  # 押韵与不押韵的句式只有末字不同
+)
+
+WU_YAN_GU_JUE = VerseForm(
+    '五言古绝', 5, rules=dict.fromkeys((1, 2, 3, 4), ['00000']), max_lines=4, kind=('古绝', '古絕'),
+)
+
+QI_YAN_GU_JUE = VerseForm(
+    '七言古绝', 7, rules=dict.fromkeys((1, 2, 3, 4), ['0000000']), max_lines=4, kind=('古绝', '古絕'),
+)
+
+# 诗体组合：字数同时符合多种诗体时都校验，取得分最高者，得分相同时取后者
+LYU_SHI = (WU_YAN, QI_YAN)  # 五言、七言的绝句、律诗、排律
+LIU_YAN_SHI = (LIU_YAN,)
+GU_JUE = (WU_YAN_GU_JUE, QI_YAN_GU_JUE)
+
+FORMS = {
+    '律诗': LYU_SHI,
+    '六言': LIU_YAN_SHI,
+    '古绝': GU_JUE,
+}
@@ -0,0 +1,123 @@
+"""
+诗歌增量校验模块。写诗时每次修改通常只改动一两句，会话保存上一次的结构与逐句判定，
+只重新计算受修改影响的部分：韵脚字与决定首句格式的句子不变时沿用全诗结构，内容、格式与上一句拗句代码都不变的句子沿用判定。
+"""
+
+from couyun.common.check_result import CheckResult
+from couyun.common.text_proceed import process_text
+from couyun.shi.shi_forms import LYU_SHI, VerseForm
+from couyun.shi.shi_rhythm import LENGTH_ERROR, ShiRhythm, is_valid_length
+
+
+class SessionDelta:
+    """一次修改后的校验结果与变化"""
+
+    def __init__(self, result: CheckResult | int, changed_lines: list[int], structure_changed: bool):
+        """
+        Args:
+            result: 修改后的校验结果或错误码
+            changed_lines: 判定发生变化的句子序号，新增的句子也计入
+            structure_changed: 韵部、首句格式等全诗结构是否重新推断
+        """
+        self.result = result
+        self.changed_lines = changed_lines
+        self.structure_changed = structure_changed
+
+
+def _line_key(line) -> tuple:
+    yun = line.yun
+    yun_key = None if yun is None else (yun.hanzi, tuple(yun.yun_list), yun.status, yun.unknown)
+    return line.sentence, line.rule, line.marks, line.ao, yun_key
+
+
+class ShiSession:
+    """
+    一首诗的增量校验会话。每次以修改后的全文调用 update，结果与重新构造 ShiRhythm 校验完全相同。
+    """
+
+    def __init__(self, yun_shu: int, is_trad: bool, forms: tuple[VerseForm, ...] = LYU_SHI):
+        """
+        Args:
+            yun_shu: 使用韵书的代码
+            is_trad: 簡體 or 繁體
+            forms: 校验的诗体，见 couyun.shi.shi_forms
+        """
+        self.yun_shu = yun_shu
+        self.is_trad = is_trad
+        self.forms = forms
+        self.result = None
+        self._poem = None
+        self._comma_pos = None
+        self._depends = None  # 全诗结构所依赖的内容及其中平仄代码的长度
+        self._plans = None  # 各候选的 (候选, 结构)
+        self._line_cache = {}  # 上一次各句判定，键为影响该句判定的全部输入
+        self._line_keys = []
+
+    def _structure_depends(self, rhythm: ShiRhythm, prefix_len: int) -> tuple:
+        """
+        全诗结构所依赖的内容：字数、标点位置、各句末字（按每种诗体的句长分法），
+        以及到决定首句格式的句子为止的平仄代码。
+        """
+        poem = rhythm.poem
+        ends = tuple(poem[form.sen_len - 1::form.sen_len] for form in rhythm.forms)
+        return len(poem), tuple(self._comma_pos or ()), ends, rhythm.analysis.pingze[:prefix_len]
+
+    def _reset(self, result: int) -> SessionDelta:
+        self._depends = self._plans = None
+        self._line_cache = {}
+        self._line_keys = []
+        self.result = result
+        return SessionDelta(result, [], True)
+
+    def update(self, text: str) -> SessionDelta:
+        """
+        以修改后的全文重新校验。
+        Args:
+            text: 输入的诗，可以带标点
+        Returns:
+            校验结果与变化；字数不正确时结果为 LENGTH_ERROR，其余错误码同 ShiRhythm.main_shi
+        """
+        poem, comma_pos = process_text(text)
+        if poem == self._poem and comma_pos == self._comma_pos:
+            return SessionDelta(self.result, [], False)
+        self._poem, self._comma_pos = poem, comma_pos
+        if not is_valid_length(len(poem), self.forms):
+            return self._reset(LENGTH_ERROR)
+        rhythm = ShiRhythm(self.yun_shu, poem, comma_pos, self.is_trad, forms=self.forms)
+
+        structure_changed = True
+        if self._depends is not None:
+            depends, prefix_len = self._depends
+            structure_changed = self._structure_depends(rhythm, prefix_len) != depends
+        if structure_changed:
+            plans = rhythm._plans()
+            if isinstance(plans, int):
+                return self._reset(plans)
+            self._plans = [(plan, rhythm._structure(plan[0], *plan[2:])) for plan in plans]
+            prefix_len = max(sen_len * (decided_line + 1) for _, (sen_len, _, _, decided_line) in self._plans)
+            self._depends = self._structure_depends(rhythm, prefix_len), prefix_len
+
+        results = []
+        line_cache = {}
+        for plan, (sen_len, rule_list, yun_positions, _) in self._plans:
+            form, main_rhythm, _, _, _, pingze = plan
+            lines = []
+            sen_mode = 0
+            for idx, rule in enumerate(rule_list):
+                is_yun = idx + 1 in yun_positions
+                key = (poem[sen_len * idx: sen_len * (idx + 1)], idx, form, rule, pingze, sen_mode,
+                       main_rhythm, is_yun)
+                line = self._line_cache.get(key)
+                if line is None:
+                    line = rhythm._line_verdict(idx, form, rule, pingze, sen_mode, main_rhythm, is_yun)
+                line_cache[key] = line
+                sen_mode = line.ao
+                lines.append(line)
+            results.append(rhythm._report_result(form, main_rhythm, lines))
+        self._line_cache = line_cache
+        self.result = rhythm._merge_results(results)
+
+        line_keys = [_line_key(line) for line in self.result.report.lines]
+        changed = [i for i, key in enumerate(line_keys) if i >= len(self._line_keys) or key != self._line_keys[i]]
+        self._line_keys = line_keys
+        return SessionDelta(self.result, changed, structure_changed)
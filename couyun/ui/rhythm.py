@@ -10,15 +10,16 @@ from PyQt6 import sip
 from PyQt6.QtCore import Qt, QMimeData, QSharedMemory
 from PyQt6.QtGui import QIcon, QPixmap, QFont, QFontDatabase
 from PyQt6.QtWidgets import QLabel, QPushButton, QWidget, QVBoxLayout, QHBoxLayout, \
-    QTextEdit, QMessageBox, QApplication, QSizePolicy, QLineEdit, QComboBox
+    QTextEdit, QMessageBox, QApplication, QSizePolicy, QLineEdit, QComboBox, QCheckBox
 from PyQt6.sip import isdeleted
 
 from couyun import CI_INDEX, STATE_PATH, FONT_PATH, ICO_PATH, bg_pic
 from couyun.ci.ci_rhythm import CiRhythm
 from couyun.ci.ci_search import search_ci, ci_type_extraction
-from couyun.common.common import show_all_rhythm
-from couyun.common.text_proceed import process_text
-from couyun.shi.shi_rhythm import ShiRhythm
+from couyun.common.common import show_all_rhythm, show_yun_hanzi
+from couyun.common.text_proceed import fold_text, process_text_folded
+from couyun.shi.shi_forms import FORMS
+from couyun.shi.shi_rhythm import ShiRhythm, is_valid_length
 from couyun.ui.bootstrap.app import bootstrap
 from couyun.ui.ci_pu_browser import CiPuBrowser
 from couyun.ui.core.logger_config import get_logger, log_exceptions
@@ -97,22 +98,24 @@ class RhythmCheckerGUI(QWidget):
 
         # 简繁体转换
         self.s2t = str.maketrans('简输没标处状误里宽与为开对这选组并汉业态绝检验错无调逻块词诗转结内该体译留创识经闭择韵应钦华据号换'
-                                 '辑么后显龙询图载准长数榆传干谱来诶务题类将样单确区当间写鹜钮点请两脚个关别参统凑书备录',
+                                 '辑么后显龙询图载准长数榆传干谱来诶务题类将样单确区当间写鹜钮点请两脚个关别参统凑书备录仅',
                                  '簡輸沒標處狀誤裏寛與為開對這選組幷漢業態絶檢驗錯無調邏塊詞詩轉結內該體譯畱創識經閉擇韻應欽華據號換'
-                                 '輯麽後顯龍詢圖載準長數楡傳幹譜來誒務題類將樣單确區當間寫鶩鈕點請兩腳個關別參統湊書備錄')
+                                 '輯麽後顯龍詢圖載準長數楡傳幹譜來誒務題類將樣單确區當間寫鶩鈕點請兩腳個關別參統湊書備錄僅')
         self.t2s = str.maketrans('簡輸沒標處狀誤裏寛與為開對這選組幷漢業態絶檢驗錯無調邏塊詞詩轉結內該體譯畱創識經閉擇韻應欽華據號換'
-                                 '輯麽後顯龍詢圖載準長數楡傳幹譜來誒務題類將樣單确區當間寫鶩鈕點請兩腳個關別參統湊書備錄',
+                                 '輯麽後顯龍詢圖載準長數楡傳幹譜來誒務題類將樣單确區當間寫鶩鈕點請兩腳個關別參統湊書備錄僅',
                                  '简输没标处状误里宽与为开对这选组并汉业态绝检验错无调逻块词诗转结内该体译留创识经闭择韵应钦华据号换'
-                                 '辑么后显龙询图载准长数榆传干谱来诶务题类将样单确区当间写鹜钮点请两脚个关别参统凑书备录')
+                                 '辑么后显龙询图载准长数榆传干谱来诶务题类将样单确区当间写鹜钮点请两脚个关别参统凑书备录仅')
 
         self.current_state = current_state
         self.is_trad = current_state['is_trad']
         self.current_yun_shu = current_state['yun_shu']
         self.current_ci_pu = current_state['ci_pu']
+        self.current_shi_form = current_state.get('shi_form', 1)
 
         self.widgets_to_translate = []
         self.yun_shu_boxes = []
         self.cipu_boxes = []
+        self.shi_form_boxes = []
 
         # 映射
         self.yun_shu_map = {1: '平水韵', 2: '中华新韵', 3: '中华通韵'}
@@ -120,6 +123,10 @@ class RhythmCheckerGUI(QWidget):
         self.yunshu_reverse_map = {'词林正韵': 1, "平水韵": 1, "中华新韵": 2, "中华通韵": 3,
                                    '詞林正韻': 1, "平水韻": 1, "中華新韻": 2, "中華通韻": 3}
         self.ci_pu_reverse_map = {'钦定词谱': 1, "龙榆生词谱": 2, '欽定詞譜': 1, "龍楡生詞譜": 2}
+        # 诗体，名称即 couyun.shi.shi_forms.FORMS 的键
+        self.shi_form_map = {1: '律诗', 2: '六言', 3: '古绝'}
+        self.shi_form_reverse_map = {'律诗': 1, '六言': 2, '古绝': 3, '律詩': 1, '古絶': 3}
+        self.shi_forms = FORMS[self.shi_form_map[self.current_shi_form]]  # 校验的诗体
 
         # 字体与样式
         font_family = load_font(FONT_PATH)
@@ -208,6 +215,15 @@ class RhythmCheckerGUI(QWidget):
         button_layout.addWidget(self.char_button)
         self.register(self.char_button)
 
+        self.yun_button = QPushButton("查韻" if self.is_trad else "查韵", button_frame)
+        self.yun_button.setFont(self.default_font)
+        self.yun_button.setStyleSheet(f"background-color: {self.my_purple};")
+        self.yun_button.setFixedWidth(200)
+        self.yun_button.setFixedHeight(45)
+        self.yun_button.clicked.connect(lambda: self.open_yun_interface())
+        button_layout.addWidget(self.yun_button)
+        self.register(self.yun_button)
+
         main_layout.addStretch(60)
 
         # ===== 底部三个按钮 =====
@@ -245,6 +261,8 @@ class RhythmCheckerGUI(QWidget):
         self.cipai_var = None
         self.yunshu_var = None
         self.cipu_var = None
+        self.ci_lin_var = None
+        self.common_var = None
         self.current_output_text = None
         self.current_input_text = None
         self.background_image = None
@@ -306,7 +324,7 @@ class RhythmCheckerGUI(QWidget):
                 print(f"box_toggle 在对 {cb} 时出错: {e}")
 
     @log_exceptions
-    def translate_new_widgets(self, start_widgets, start_yun, start_ci):
+    def translate_new_widgets(self, start_widgets, start_yun, start_ci, start_shi):
         """新界面创建后，若当前是繁体模式，立即翻译新增控件和下拉框"""
         if not self.is_trad:
             return
@@ -320,6 +338,7 @@ class RhythmCheckerGUI(QWidget):
 
         self.box_toggle(self.yun_shu_boxes[start_yun:], self.yun_shu_map, self.current_yun_shu, True)
         self.box_toggle(self.cipu_boxes[start_ci:], self.ci_pu_map, self.current_ci_pu, True)
+        self.box_toggle(self.shi_form_boxes[start_shi:], self.shi_form_map, self.current_shi_form, True)
 
     @staticmethod
     @log_exceptions
@@ -331,6 +350,15 @@ class RhythmCheckerGUI(QWidget):
         ot.insertPlainText(res)
         ot.setReadOnly(True)
 
+    def folded_note(self, text: str, folded_positions: list[int]) -> str:
+        """提示哪些字由兼容区汉字或康熙部首归一而来"""
+        if not folded_positions:
+            return ''
+        chars = '、'.join(f'第{pos + 1}字「{text[pos]}」' for pos in folded_positions)
+        if self.is_trad:
+            return f'{chars}原爲兼容區漢字或康熙部首，已按正常漢字處理\n'
+        return f'{chars}原为兼容区汉字或康熙部首，已按正常汉字处理\n'
+
     @log_exceptions
     def my_warn(self, title, msg):
         if self.is_trad:
@@ -364,6 +392,7 @@ class RhythmCheckerGUI(QWidget):
         # 更新下拉框（如果它们还存在）
         self.box_toggle(self.yun_shu_boxes, self.yun_shu_map, self.current_yun_shu, to_trad)
         self.box_toggle(self.cipu_boxes, self.ci_pu_map, self.current_ci_pu, to_trad)
+        self.box_toggle(self.shi_form_boxes, self.shi_form_map, self.current_shi_form, to_trad)
 
         if hasattr(self, 'toggle_button') and self.toggle_button is not None:
             self.toggle_button.setText('繁體' if self.is_trad else '简体')
@@ -385,6 +414,7 @@ class RhythmCheckerGUI(QWidget):
         old_widgets = len(self.widgets_to_translate)
         old_yun = len(self.yun_shu_boxes)
         old_ci = len(self.cipu_boxes)
+        old_shi = len(self.shi_form_boxes)
 
         self.main_interface.hide()
         if hasattr(self, 'bottom_button_frame'):
@@ -472,6 +502,16 @@ class RhythmCheckerGUI(QWidget):
 
             content_layout.addWidget(make_row("选择韵书:", self.yunshu_var, fixed_w=180))
 
+        # ===== 诗体选择 =====
+        if mode == 'p':
+            self.shi_form_var = QComboBox()
+            self.shi_form_var.addItems([self.shi_form_map[k] for k in sorted(self.shi_form_map)])
+            self.shi_form_var.setCurrentText(self.shi_form_map[self.current_shi_form])
+            self.shi_form_var.currentIndexChanged.connect(lambda: self.on_shi_form_change())
+            self.shi_form_boxes.append(self.shi_form_var)
+
+            content_layout.addWidget(make_row("选择诗体:", self.shi_form_var, fixed_w=180))
+
         # ===== 词校验模块 =====
         if mode == 'c':
             self.cipai_var = QLineEdit()
@@ -488,6 +528,27 @@ class RhythmCheckerGUI(QWidget):
 
             content_layout.addWidget(make_row("选择词谱:", self.cipu_var, fixed_w=220))
 
+        # ===== 查韵模块 =====
+        if mode == 'y':
+            self.ci_lin_var = QCheckBox("词林正韵")
+            self.ci_lin_var.setFont(self.default_font)
+            self.ci_lin_var.setStyleSheet(label_style)
+            self.register(self.ci_lin_var)
+            self.common_var = QCheckBox("仅常用字")
+            self.common_var.setFont(self.default_font)
+            self.common_var.setStyleSheet(label_style)
+            self.common_var.setChecked(True)
+            self.register(self.common_var)
+
+            check_row = QWidget()
+            check_layout = QHBoxLayout(check_row)
+            check_layout.setContentsMargins(0, 0, 0, 0)
+            check_layout.setSpacing(12)
+            check_layout.addWidget(self.ci_lin_var)
+            check_layout.addWidget(self.common_var)
+            check_layout.addStretch(1)
+            content_layout.addWidget(check_row)
+
         # ===== 提示 =====
         il = make_label(hint_text, self.default_font)
         content_layout.addWidget(il, alignment=Qt.AlignmentFlag.AlignLeft)
@@ -498,18 +559,18 @@ class RhythmCheckerGUI(QWidget):
         max_h = int(self.height() * 0.8)
 
         io_container = QWidget()
-        io_layout = QVBoxLayout(io_container) if mode == 's' else QHBoxLayout(io_container)
+        io_layout = QVBoxLayout(io_container) if mode in ('s', 'y') else QHBoxLayout(io_container)
         io_layout.setSpacing(8)
         io_layout.setContentsMargins(0, 0, 0, 0)
 
-        if mode == 's':
+        if mode in ('s', 'y'):
             it = SingleCharInput()
         else:
             it = QTextEdit()
         it.setAcceptRichText(False)
         it.setFont(self.small_font)
         it.setFixedWidth(it_w)
-        it.setFixedHeight(30 if mode == 's' else int(max_h * 0.55))
+        it.setFixedHeight(30 if mode in ('s', 'y') else int(max_h * 0.55))
 
         ot = QTextEdit()
         ot.setAcceptRichText(False)
@@ -517,7 +578,8 @@ class RhythmCheckerGUI(QWidget):
         ot.setReadOnly(True)
         ot.setFixedWidth(ot_w)
         ot.setFixedHeight(int(max_h * 0.55))
-        ot.setLineWrapMode(QTextEdit.LineWrapMode.NoWrap)
+        # 查韵结果是一长串汉字，需要自动换行
+        ot.setLineWrapMode(QTextEdit.LineWrapMode.WidgetWidth if mode == 'y' else QTextEdit.LineWrapMode.NoWrap)
         ot.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
         ot.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
         ot.hide()
@@ -573,7 +635,7 @@ class RhythmCheckerGUI(QWidget):
         bf_layout.addStretch(1)
 
         content_layout.addWidget(bf)
-        self.translate_new_widgets(old_widgets, old_yun, old_ci)
+        self.translate_new_widgets(old_widgets, old_yun, old_ci, old_shi)
 
         self.current_input_text = it
         self.current_output_text = ot
@@ -637,6 +699,18 @@ class RhythmCheckerGUI(QWidget):
         self.current_ci_pu = self.ci_pu_reverse_map[text]
         self.current_state['ci_pu'] = self.current_ci_pu
 
+    @log_exceptions
+    def on_shi_form_change(self):
+        text = self.shi_form_var.currentText()
+        if not text:
+            return
+        if text not in self.shi_form_reverse_map:
+            logger.warning(f"当前诗体不存在 reverse_map: {text}")
+            return
+        self.current_shi_form = self.shi_form_reverse_map[text]
+        self.shi_forms = FORMS[self.shi_form_map[self.current_shi_form]]
+        self.current_state['shi_form'] = self.current_shi_form
+
     @log_exceptions
     def open_poem_interface(self):
         self.input_text, self.output_text = self.create_generic_interface(
@@ -658,6 +732,13 @@ class RhythmCheckerGUI(QWidget):
             button_text="开始查询", command_func=self.check_char, mode='s'
         )
 
+    @log_exceptions
+    def open_yun_interface(self):
+        self.input_text, self.output_text = self.create_generic_interface(
+            title_text="查韵", hint_text='请输入需要查询的韵部（编号或部名）：',
+            button_text="开始查询", command_func=self.check_yun, mode='y'
+        )
+
     @log_exceptions
     def return_to_main(self):
         # 只隐藏功能页，不动主界面结构
@@ -676,16 +757,16 @@ class RhythmCheckerGUI(QWidget):
             self.my_warn("找茬是吧？", "请输入需要校验的诗！")
             return
 
-        processed, comma_pos = process_text(text)
+        processed, comma_pos, folded = process_text_folded(text)
         length = len(processed)
-        if (length % 10 != 0 and length % 14 != 0) or length < 20:
+        if not is_valid_length(length, self.shi_forms):
             self.my_warn("要不检查下？", f"诗的字数不正确，可能有不能识别的生僻字，你输入了{length}字")
             it.setPlainText(processed)  # Tk: delete + insert
             return
 
-        process = ShiRhythm(self.current_yun_shu, processed, comma_pos, self.is_trad)
+        process = ShiRhythm(self.current_yun_shu, processed, comma_pos, self.is_trad, forms=self.shi_forms)
         res = process.main_shi()
-        msgs = {1: '一句的长短不符合律诗的标准！请检查标点及字数。',
+        msgs = {1: '一句的长短不符合所选诗体的标准！请检查标点及字数。',
                 2: '你输入的每一个韵脚都不在韵书里面诶，我没法分析的！'}
         if res in msgs:
             self.my_warn("怎么回事？", msgs[res])
@@ -693,7 +774,7 @@ class RhythmCheckerGUI(QWidget):
 
         end_time = time()
         time_result = f'檢測完畢，耗時{end_time - start_time:.5f}s\n' if self.is_trad else f'检测完毕，耗时{end_time - start_time:.5f}s\n'
-        res += time_result
+        res += self.folded_note(processed, folded) + time_result
 
         self.display_result(ot, res)  # 调用 display_result 输出
 
@@ -706,7 +787,7 @@ class RhythmCheckerGUI(QWidget):
             return
 
         cp, fm = self.cipai_var.text().strip(), self.cipai_form.text().strip()  # QLineEdit.text()
-        proc, proc_comma_pos = process_text(text)
+        proc, proc_comma_pos, folded = process_text_folded(text)
         length = len(proc)
 
         process = CiRhythm(self.current_yun_shu, cp, proc, proc_comma_pos, fm,
@@ -726,7 +807,7 @@ class RhythmCheckerGUI(QWidget):
 
         end_time = time()
         time_result = f'檢測完畢，耗時{end_time - start_time:.5f}s\n\n' if self.is_trad else f'检测完毕，耗时{end_time - start_time:.5f}s\n\n'
-        res += time_result
+        res += self.folded_note(proc, folded) + time_result
 
         self.display_result(ot, res)  # 输出结果
 
@@ -743,6 +824,7 @@ class RhythmCheckerGUI(QWidget):
         if not text:
             self.my_warn("找茬是吧？", "请输入需要查询的汉字！")
             return
+        text, folded = fold_text(text)
 
         # 匹配第一个汉字（支持 CJK 扩展字符）
         match = re.search(r'[\u4e00-\u9fff\u3400-\u4dbf\u3007\u2642\U00020000-\U0002A6DF]', text)
@@ -757,6 +839,25 @@ class RhythmCheckerGUI(QWidget):
         if len(text) != 1:
             warn = '你輸入了多個字符，系統將查詢第一個漢字\n\n' if self.is_trad else '你输入了多个字符，系统将查询第一个汉字\n\n'
             res = warn + res
+        if match.start() in folded:
+            res = self.folded_note(text, [match.start()]) + '\n' + res
+
+        self.display_result(ot, res)
+
+    @log_exceptions
+    def check_yun(self, it, ot):
+        """查询一个韵部中的全部汉字"""
+        text = it.toPlainText().strip()
+        if not text:
+            self.my_warn("找茬是吧？", "请输入需要查询的韵部！")
+            return
+
+        res = show_yun_hanzi(text, self.current_yun_shu, self.is_trad,
+                             ci_lin=self.current_yun_shu == 1 and self.ci_lin_var.isChecked(),
+                             common_only=self.common_var.isChecked())
+        if res is None:
+            self.my_warn("要不检查下？", "无法识别输入的韵部，请输入韵部编号或部名！")
+            return
 
         self.display_result(ot, res)
 